@@ -0,0 +1,275 @@
+"""Offline load test: virtual students driving the real Dispatcher.
+
+    python -m benchmarks.load --students 200
+    python -m benchmarks.load --students 500 --think 2 --api-latency-ms 40 --json load.json
+
+The Dispatcher and routers come from ``main.build_dispatcher`` with the
+configured FSM storage; the ``Bot`` talks to a stub session that answers
+every API call locally (after ``--api-latency-ms``), so nothing reaches
+Telegram. Each student goes through the whole script: /start, registration,
+«Новый вариант», subject, difficulty, number of tasks, answering every task
+(some answers wrong, followed by «Решить ещё раз» or «Узнать ответ») and
+«Статистика». Updates of one student are fed one after another through
+``dp.feed_update`` with ``--think`` seconds on average between them;
+students start spread over ``--ramp`` seconds.
+
+The report has update throughput, latency percentiles per step, handler
+errors (``database is locked`` counts as contention), SQL statement times
+and the peak of checked out pool connections.
+
+Settings come from the environment as usual, except that ``DATABASE_URL``
+and ``PDF_DIR`` point to a temporary directory unless ``--url`` is given;
+tables are created there by ``init_db``. Only point ``--url`` at a scratch
+database.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+
+def _percentile(values: list[float], q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def _summary(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50": round(_percentile(values, 50), 2),
+        "p95": round(_percentile(values, 95), 2),
+        "p99": round(_percentile(values, 99), 2),
+        "max": round(max(values), 2) if values else 0.0,
+    }
+
+
+async def simulate(args: argparse.Namespace) -> dict:
+    # Project modules read the settings at import time, so they are imported
+    # only after main() has pointed DATABASE_URL and PDF_DIR at the scratch dir.
+    from aiogram import Bot
+    from aiogram.client.session.base import BaseSession
+    from aiogram.methods import SendDocument, TelegramMethod
+    from aiogram.types import CallbackQuery, Chat, Document, Message, Update
+    from aiogram.types import User as TgUser
+    from sqlalchemy import event
+
+    import main as app
+    from bot.storage import build_fsm_storage
+    from core.config import load_settings
+    from db.base import AsyncSessionFactory, engine, init_db
+    from db.cache import active_set_cache, user_cache
+    from db.writer import attempt_writer
+    from pdf.service import pdf_renderer
+
+    ids = itertools.count(1)
+    api_latency = args.api_latency_ms / 1000
+
+    class StubSession(BaseSession):
+        """Answers Bot API calls locally: sent messages come back as ``Message`` objects."""
+
+        async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+            if api_latency:
+                await asyncio.sleep(api_latency)
+            if method.__returning__ is not Message:
+                return True
+            document = None
+            if isinstance(method, SendDocument):
+                document = Document(file_id=f"FILE{next(ids)}", file_unique_id=f"U{next(ids)}")
+            chat_id = getattr(method, "chat_id", None) or 0
+            return Message(
+                message_id=next(ids),
+                date=datetime.now(),
+                chat=Chat(id=chat_id, type="private"),
+                text=getattr(method, "text", None),
+                document=document,
+            ).as_(bot)
+
+        async def stream_content(self, *args: Any, **kwargs: Any):
+            yield b""
+
+        async def close(self) -> None:
+            pass
+
+    settings = load_settings()
+    await init_db()
+    bot = Bot(settings.bot_token, session=StubSession())
+    storage = build_fsm_storage(settings, AsyncSessionFactory)
+    dp = app.build_dispatcher(storage)
+    if attempt_writer is not None:
+        attempt_writer.start()
+
+    sql_ms: dict[str, list[float]] = defaultdict(list)
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _started(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info["load_started"] = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _finished(conn, cursor, statement, parameters, context, executemany) -> None:
+        started = conn.info.pop("load_started", None)
+        if started is not None:
+            sql_ms[statement.lstrip().split(None, 1)[0].upper()].append((time.perf_counter() - started) * 1000)
+
+    pool = engine.sync_engine.pool
+    peak_checked_out = 0
+
+    async def watch_pool() -> None:
+        nonlocal peak_checked_out
+        while True:
+            peak_checked_out = max(peak_checked_out, pool.checkedout())
+            await asyncio.sleep(0.01)
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    rng = random.Random(args.seed)
+    bot_user = TgUser(id=bot.id, is_bot=True, first_name="bot")
+
+    def message(tg_id: int, text: str) -> Update:
+        sender = TgUser(id=tg_id, is_bot=False, first_name=f"Ученик {tg_id}")
+        chat = Chat(id=tg_id, type="private")
+        return Update(
+            update_id=next(ids),
+            message=Message(message_id=next(ids), date=datetime.now(), chat=chat, from_user=sender, text=text),
+        )
+
+    def callback(tg_id: int, data: str) -> Update:
+        sender = TgUser(id=tg_id, is_bot=False, first_name=f"Ученик {tg_id}")
+        chat = Chat(id=tg_id, type="private")
+        origin = Message(message_id=next(ids), date=datetime.now(), chat=chat, from_user=bot_user, text="…")
+        query = CallbackQuery(id=str(next(ids)), from_user=sender, chat_instance="load", message=origin, data=data)
+        return Update(update_id=next(ids), callback_query=query)
+
+    async def feed(step: str, update: Update) -> None:
+        started = time.perf_counter()
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as exc:
+            errors["database is locked" if "database is locked" in str(exc) else type(exc).__name__] += 1
+        latencies[step].append((time.perf_counter() - started) * 1000)
+        if args.think:
+            await asyncio.sleep(rng.uniform(0, 2 * args.think))
+
+    def correct_answer(tg_id: int, order: int) -> Optional[str]:
+        # the student "solved" the task: peek at the bot's in-process caches
+        user = user_cache.get(tg_id)
+        active = active_set_cache.get(user.id) if user else None
+        task = active.task(order) if active else None
+        return task.correct_answer if task else None
+
+    async def student(n: int) -> None:
+        tg_id = 700_000_000 + n
+        await asyncio.sleep(rng.uniform(0, args.ramp))
+        await feed("start", message(tg_id, "/start"))
+        await feed("register", callback(tg_id, "register"))
+        await feed("full_name", message(tg_id, f"Ученик {n}"))
+        await feed("grade", message(tg_id, rng.choice(["7А", "8Б", "9А", "9Б", "11А"])))
+        await feed("new_variant", message(tg_id, "Новый вариант"))
+        await feed("subject", callback(tg_id, f"subject:{rng.choice(['algebra', 'geometry'])}"))
+        await feed("difficulty", callback(tg_id, f"difficulty:{rng.choice(['easy', 'normal', 'hard'])}"))
+        await feed("count", message(tg_id, str(args.tasks)))
+        await feed("go_check", callback(tg_id, "go_check"))
+        for order in range(1, args.tasks + 1):
+            answer = correct_answer(tg_id, order)
+            if answer is not None and rng.random() < args.correct:
+                # half of the right answers typed with a decimal comma
+                await feed("answer", message(tg_id, answer.replace(".", ",") if rng.random() < 0.5 else answer))
+                continue
+            await feed("answer", message(tg_id, rng.choice(["0", "-1", "100", "1/2", "не знаю"])))
+            if answer is not None and rng.random() < 0.5:
+                await feed("retry", callback(tg_id, "retry"))
+                await feed("answer", message(tg_id, answer))
+            else:
+                await feed("show_answer", callback(tg_id, "show_answer"))
+        await feed("stats", message(tg_id, "Статистика"))
+
+    watcher = asyncio.create_task(watch_pool())
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(student(n) for n in range(args.students)))
+        elapsed = time.perf_counter() - started
+    finally:
+        watcher.cancel()
+        if attempt_writer is not None:
+            await attempt_writer.close()
+        await storage.close()
+        await bot.session.close()
+        pdf_renderer.shutdown()
+        await engine.dispose()
+
+    updates = sum(len(values) for values in latencies.values())
+    return {
+        "database": engine.url.render_as_string(hide_password=True),
+        "students": args.students,
+        "tasks_per_student": args.tasks,
+        "think_seconds": args.think,
+        "api_latency_ms": args.api_latency_ms,
+        "attempt_write_behind": attempt_writer is not None,
+        "seconds": round(elapsed, 3),
+        "updates": updates,
+        "updates_per_second": round(updates / elapsed, 1),
+        "answers_per_second": round(len(latencies["answer"]) / elapsed, 1),
+        "errors": dict(errors),
+        "latency_ms": {step: _summary(values) for step, values in latencies.items()},
+        "all_updates_ms": _summary([value for values in latencies.values() for value in values]),
+        "db": {
+            "statements": sum(len(values) for values in sql_ms.values()),
+            "statement_ms": {operation: _summary(values) for operation, values in sorted(sql_ms.items())},
+            "pool_size": pool.size(),
+            "pool_peak_checked_out": peak_checked_out,
+        },
+    }
+
+
+def _print(report: dict) -> None:
+    print(
+        f"{report['students']} students, {report['updates']} updates in {report['seconds']} s: "
+        f"{report['updates_per_second']} updates/s, {report['answers_per_second']} answers/s"
+    )
+    print(f"errors: {report['errors'] or 0}")
+    print(f"{'step':<14}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, s in [*report["latency_ms"].items(), ("(all)", report["all_updates_ms"])]:
+        print(f"{step:<14}{s['count']:>8}{s['p50']:>10}{s['p95']:>10}{s['p99']:>10}{s['max']:>10}")
+    db = report["db"]
+    print(
+        f"database: {db['statements']} statements, pool peak {db['pool_peak_checked_out']} "
+        f"connections checked out (pool size {db['pool_size']})"
+    )
+    for operation, s in db["statement_ms"].items():
+        print(f"  {operation:<10}{s['count']:>8}  p50 {s['p50']} ms  p95 {s['p95']} ms  p99 {s['p99']} ms  max {s['max']} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--tasks", type=int, default=10, help="tasks per variant (1-15)")
+    parser.add_argument("--correct", type=float, default=0.7, help="share of tasks answered right the first time")
+    parser.add_argument("--think", type=float, default=0.5, help="mean pause between a student's updates, seconds")
+    parser.add_argument("--ramp", type=float, default=5.0, help="students start spread over this many seconds")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="simulated Bot API round trip")
+    parser.add_argument("--url", help="database URL; a scratch database (default: temporary SQLite file)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = args.url or f"sqlite+aiosqlite:///{Path(tmp) / 'load.db'}"
+        os.environ["PDF_DIR"] = str(Path(tmp) / "pdf")
+        os.environ.setdefault("BOT_TOKEN", "123456:LOAD-TEST")
+        report = asyncio.run(simulate(args))
+    _print(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
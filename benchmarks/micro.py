@@ -0,0 +1,222 @@
+"""Microbenchmarks of the hot paths, compared against a stored baseline.
+
+    python -m benchmarks.micro                     # run, compare with benchmarks/baseline.json
+    python -m benchmarks.micro --save-baseline     # run and overwrite the baseline
+    python -m benchmarks.micro --only pdf --skip-db
+
+Each case reports the median time per call over several rounds. A case
+fails when its median exceeds the baseline by more than its threshold
+(stored with the baseline, ``--threshold`` overrides all of them); the run
+then exits with status 1. Baselines only compare on the machine that wrote
+them: after moving to other hardware, save a new one first.
+
+The database cases run on a copy of a synthetic SQLite database
+(``benchmarks.synthetic``, by default 10k users and 1M attempts) that is
+built on first use and cached under ``benchmarks/.data``.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from benchmarks.synthetic import synthetic_db
+from core.config import load_settings
+from db.engine import create_engine
+from db.models import GeneratedTask, Subject, TaskSet, User
+from db.repository import calc_stats, create_task_set
+from pdf.generator import build_pdf
+from tasks.checker import compare_answers, compare_answers_batch, to_fixed
+from tasks.generator import generate_tasks
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+VALID_ANSWERS = [("1.25", "1,25"), ("-3", "-3"), ("0.75", "0.750"), ("12", "13"), ("2.5", "2.4999999")] * 20
+INVALID_ANSWERS = [("1.25", "1/4"), ("-3", "minus 3"), ("0.75", "75%"), ("12", ""), ("2.5", "2.5.1")] * 20
+
+
+@dataclass
+class Case:
+    name: str
+    # one call of ``op`` performs ``batch`` operations of the measured kind
+    op: Callable[[], Union[Any, Awaitable[Any]]]
+    batch: int = 1
+    number: int = 20
+    repeat: int = 5
+    threshold: float = 0.3
+
+
+@dataclass
+class Result:
+    name: str
+    median_us: float
+    min_us: float
+    threshold: float
+
+    def as_dict(self) -> dict:
+        return {"median_us": round(self.median_us, 2), "min_us": round(self.min_us, 2), "threshold": self.threshold}
+
+
+async def measure(case: Case) -> Result:
+    is_async = asyncio.iscoroutinefunction(case.op)
+    rounds = []
+    for attempt in range(case.repeat + 1):
+        started = time.perf_counter()
+        for _ in range(case.number):
+            if is_async:
+                await case.op()
+            else:
+                case.op()
+        elapsed = time.perf_counter() - started
+        if attempt:  # the first round only warms caches up
+            rounds.append(elapsed / (case.number * case.batch) * 1e6)
+    return Result(case.name, statistics.median(rounds), min(rounds), case.threshold)
+
+
+def cpu_cases(pdf_dir: Path) -> list[Case]:
+    cases = []
+    for subject in Subject:
+        cases.append(Case(f"generate_tasks[{subject.value}]", lambda s=subject: generate_tasks(s, 15), number=200))
+
+    def check(pairs):
+        for correct, given in pairs:
+            compare_answers(correct, given)
+
+    cases.append(Case("compare_answers[valid]", lambda: check(VALID_ANSWERS), batch=len(VALID_ANSWERS), number=100))
+    cases.append(Case("compare_answers[invalid]", lambda: check(INVALID_ANSWERS), batch=len(INVALID_ANSWERS), number=100))
+    # the way a variant is graded: stored fixed-point answers, one batch call
+    stored = [(correct, given, to_fixed(correct)) for correct, given in VALID_ANSWERS]
+    cases.append(Case("compare_answers_batch[stored]", lambda: compare_answers_batch(stored), batch=len(stored), number=100))
+
+    user = User(id=1, tg_id=1, full_name="Иванов Иван Иванович", grade="9А")
+    for count in (1, 5, 15):
+        task_set = TaskSet(id=count, subject=Subject.algebra, total_tasks=count)
+        tasks = [
+            GeneratedTask(order_index=i + 1, subject=Subject.algebra, topic=t.topic, text=t.text, correct_answer=t.answer)
+            for i, t in enumerate(generate_tasks(Subject.algebra, count))
+        ]
+        cases.append(
+            Case(
+                f"build_pdf[{count}]",
+                lambda ts=task_set, ts_tasks=tasks: build_pdf(ts, ts_tasks, user, pdf_dir, bot_name="bench_bot"),
+                number=5,
+            )
+        )
+    return cases
+
+
+def db_cases(sessions: async_sessionmaker[AsyncSession], users: int) -> list[Case]:
+    rng = random.Random(0)
+    tasks = [{"topic": t.topic, "text": t.text, "answer": t.answer} for t in generate_tasks(Subject.algebra, 15)]
+
+    async def new_variant():
+        async with sessions() as session:
+            await create_task_set(session, user_id=rng.randrange(users) + 1, subject=Subject.algebra, tasks=tasks)
+
+    async def stats():
+        async with sessions() as session:
+            await calc_stats(session, user_id=rng.randrange(users) + 1)
+
+    return [
+        Case("create_task_set[15]", new_variant, number=20, threshold=0.5),
+        Case("calc_stats", stats, number=50, threshold=0.5),
+    ]
+
+
+def compare(baseline: dict, results: list[Result], threshold: Optional[float] = None) -> list[str]:
+    """Names of the cases slower than their baseline by more than the threshold."""
+    regressions = []
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            continue
+        limit = threshold if threshold is not None else base.get("threshold", result.threshold)
+        if result.median_us > base["median_us"] * (1 + limit):
+            regressions.append(result.name)
+    return regressions
+
+
+def _print(result: Result, base: Optional[dict]) -> None:
+    line = f"  {result.name:<28} {result.median_us:>12.1f} us  (min {result.min_us:.1f})"
+    if base:
+        change = result.median_us / base["median_us"] - 1
+        line += f"  {change:+7.1%} vs baseline (limit +{base.get('threshold', result.threshold):.0%})"
+    print(line)
+
+
+async def run(args: argparse.Namespace) -> list[Result]:
+    random.seed(0)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = cpu_cases(Path(tmp) / "pdf")
+        if not args.skip_db:
+            # a copy, so created variants do not accumulate in the cached database
+            db_path = Path(tmp) / "bench.db"
+            shutil.copyfile(synthetic_db(args.users, args.attempts, rebuild=args.rebuild_db), db_path)
+            engine = create_engine(load_settings(), f"sqlite+aiosqlite:///{db_path}")
+            cases += db_cases(async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession), args.users)
+        try:
+            for case in cases:
+                if args.only and not any(pattern in case.name for pattern in args.only):
+                    continue
+                results.append(await measure(case))
+        finally:
+            if not args.skip_db:
+                await engine.dispose()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, help="allowed slowdown for every case, e.g. 0.25 for +25%%")
+    parser.add_argument("--only", action="append", help="run only cases whose name contains this (repeatable)")
+    parser.add_argument("--skip-db", action="store_true", help="skip the synthetic database cases")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--attempts", type=int, default=1_000_000)
+    parser.add_argument("--rebuild-db", action="store_true", help="rebuild the cached synthetic database")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())["results"] if args.baseline.exists() else {}
+    results = asyncio.run(run(args))
+    for result in results:
+        _print(result, baseline.get(result.name))
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.machine()},
+        "synthetic_db": {"users": args.users, "attempts": args.attempts},
+        "results": {result.name: result.as_dict() for result in results},
+    }
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.save_baseline:
+        if args.baseline.exists():
+            # keep cases that were not run this time
+            report["results"] = {**baseline, **report["results"]}
+        args.baseline.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    regressions = compare(baseline, results, args.threshold)
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Synthetic SQLite database for the database benchmarks.
+
+``build_synthetic_db`` fills a fresh file with ``users`` students in a few
+grades, one finished 10-task variant per student and ``attempts`` answer
+attempts spread over the last 30 days, then fills the statistics counters
+the way ``manage.py rebuild-stats`` does. Building 1M attempts takes a
+while, so ``synthetic_db`` keeps the result under ``benchmarks/.data`` and
+reuses it.
+"""
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+
+from sqlalchemy import create_engine, insert
+
+from db import models
+from db.models import AnswerAttempt, GeneratedTask, Subject, TaskSet, User
+from db.stats import rebuild_statements
+
+DATA_DIR = Path(__file__).resolve().parent / ".data"
+TASKS_PER_SET = 10
+TOPICS = {
+    Subject.algebra: ["decimal_arithmetic", "linear_equation", "quadratic_equation", "probability", "percent"],
+    Subject.geometry: ["rectangle", "triangle", "circle", "angles", "trapezoid"],
+}
+GRADES = ["7А", "7Б", "8А", "8Б", "9А", "9Б", "10А", "11А"]
+_CHUNK = 50_000
+
+
+def _chunks(rows: Iterator[dict]) -> Iterator[list[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == _CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_synthetic_db(path: Path, users: int, attempts: int, seed: int = 0) -> Path:
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    path.unlink(missing_ok=True)
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(engine)
+    subjects = [rng.choice(list(Subject)) for _ in range(users)]
+
+    def user_rows():
+        for i in range(users):
+            grade = GRADES[i % len(GRADES)]
+            yield {"id": i + 1, "tg_id": 500_000_000 + i, "full_name": f"Ученик {i}", "grade": grade, "created_at": now}
+
+    def set_rows():
+        for i in range(users):
+            yield {
+                "id": i + 1,
+                "user_id": i + 1,
+                "subject": subjects[i],
+                "total_tasks": TASKS_PER_SET,
+                "is_completed": True,
+                "created_at": now,
+            }
+
+    def task_rows():
+        for i in range(users):
+            topics = TOPICS[subjects[i]]
+            for order in range(1, TASKS_PER_SET + 1):
+                yield {
+                    "id": i * TASKS_PER_SET + order,
+                    "task_set_id": i + 1,
+                    "order_index": order,
+                    "subject": subjects[i],
+                    "topic": topics[order % len(topics)],
+                    "difficulty": "normal",
+                    "text": f"Задача {order}",
+                    "correct_answer": str(order),
+                    "created_at": now,
+                }
+
+    def attempt_rows():
+        for _ in range(attempts):
+            user = rng.randrange(users)
+            order = rng.randrange(TASKS_PER_SET) + 1
+            correct = rng.random() < 0.7
+            yield {
+                "task_id": user * TASKS_PER_SET + order,
+                "user_id": user + 1,
+                "user_answer": str(order) if correct else "0",
+                "is_correct": correct,
+                "looked_answer": not correct and rng.random() < 0.2,
+                "created_at": now - timedelta(seconds=rng.randrange(30 * 86400)),
+            }
+
+    with engine.begin() as conn:
+        tables = [(User, user_rows()), (TaskSet, set_rows()), (GeneratedTask, task_rows()), (AnswerAttempt, attempt_rows())]
+        for table, rows in tables:
+            for chunk in _chunks(rows):
+                conn.execute(insert(table), chunk)
+        for stmt in rebuild_statements(now.date()):
+            conn.execute(stmt)
+    engine.dispose()
+    return path
+
+
+def synthetic_db(users: int, attempts: int, rebuild: bool = False) -> Path:
+    """Path of the cached synthetic database, built on first use."""
+    path = DATA_DIR / f"synthetic_{users}u_{attempts}a.db"
+    if rebuild or not path.exists():
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        build_synthetic_db(tmp, users, attempts)
+        tmp.replace(path)
+    return path
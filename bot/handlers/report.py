@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from core.config import load_settings
+from db.base import get_session
+from db.rollups import grade_report
+
+router = Router()
+settings = load_settings()
+
+DEFAULT_REPORT_DAYS = 30
+MAX_REPORT_DAYS = 366
+SUBJECT_TITLES = {"algebra": "Алгебра", "geometry": "Геометрия"}
+
+USAGE = (
+    "Формат: /report [класс] [дней], например /report 9Б 14. Только период: /report days=7. "
+    f"Период — не больше {MAX_REPORT_DAYS} дней."
+)
+
+
+def parse_report_args(text: Optional[str]) -> tuple[Optional[str], int]:
+    """``(grade, days)`` from the /report arguments; ValueError if they do not fit.
+
+    Positional arguments are the grade and then the number of days: grades are
+    free text and often plain numbers, so "/report 9" is grade 9. ``grade=X``
+    and ``days=N`` may be given in any order instead. At most
+    ``MAX_REPORT_DAYS`` days.
+    """
+    grade: Optional[str] = None
+    days = DEFAULT_REPORT_DAYS
+    positional = []
+    for arg in (text or "").split():
+        key, sep, value = arg.partition("=")
+        if not sep:
+            positional.append(arg)
+        elif key == "grade" and value:
+            grade = value
+        elif key == "days" and value.isdigit():
+            days = int(value)
+        else:
+            raise ValueError(arg)
+    if len(positional) > 2 or (positional and grade is not None):
+        raise ValueError(text)
+    if positional:
+        grade = positional[0]
+    if len(positional) == 2:
+        if not positional[1].isdigit():
+            raise ValueError(positional[1])
+        days = int(positional[1])
+    if days > MAX_REPORT_DAYS:
+        raise ValueError(days)
+    return grade, max(1, days)
+
+
+def _rate(correct: int, total: int) -> str:
+    return f"{round(correct / total * 100, 1)}% ({correct} из {total})"
+
+
+@router.message(Command("report"))
+async def class_report(message: Message, command: CommandObject) -> None:
+    """/report [класс] [дней] — успеваемость по темам из дневных сводок."""
+    if message.from_user.id not in settings.teacher_ids:
+        await message.answer("Отчёт доступен только учителям.")
+        return
+    try:
+        grade, days = parse_report_args(command.args)
+    except ValueError:
+        await message.answer(USAGE)
+        return
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    async with get_session() as session:
+        rows = await grade_report(session, since=since, grade=grade)
+    if not rows:
+        await message.answer("Нет данных за выбранный период.")
+        return
+
+    lines = [f"Класс {grade}, последние {days} дн.:" if grade else f"Все классы, последние {days} дн.:"]
+    current = None
+    for row in rows:
+        subject = SUBJECT_TITLES.get(row.subject.value, row.subject.value)
+        if grade:
+            if row.subject != current:
+                current = row.subject
+                lines.append(f"{subject}:")
+            line = f"- {row.topic}: {_rate(row.correct, row.total)}"
+        else:
+            if row.grade != current:
+                current = row.grade
+                lines.append(f"{row.grade}:")
+            line = f"- {subject}: {_rate(row.correct, row.total)}"
+        if row.peeked:
+            line += f", подсмотрено {row.peeked}"
+        lines.append(line)
+    lines.append(f"Сводки обновляются раз в {int(settings.rollup_interval // 60) or 1} мин.")
+    await message.answer("\n".join(lines))
@@ -1,20 +1,24 @@
+from typing import Optional
+
 from aiogram import F, Router
 from aiogram.types import Message
 
 from bot.keyboards import main_menu_keyboard
 from db.base import get_session
-from db.repository import calc_stats, get_user
+from db.models import User
+from db.repository import calc_stats
+from db.writer import sync_attempts
 
 router = Router()
 
 
 @router.message(F.text == "Статистика")
-async def show_stats(message: Message) -> None:
+async def show_stats(message: Message, user: Optional[User]) -> None:
+    if not user:
+        await message.answer("Сначала зарегистрируйтесь через /start.")
+        return
+    await sync_attempts(user.id)
     async with get_session() as session:
-        user = await get_user(session, tg_id=message.from_user.id)
-        if not user:
-            await message.answer("Сначала зарегистрируйтесь через /start.")
-            return
         stats = await calc_stats(session, user_id=user.id)
     total = stats["total_attempts"]
     correct = stats["total_correct"]
@@ -1,6 +1,12 @@
+import asyncio
+from contextlib import suppress
+from datetime import datetime
+from typing import Optional
+
 from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, FSInputFile, Message
+from aiogram.types import BufferedInputFile, CallbackQuery, Message
 
 from bot.keyboards import (
     after_pdf_keyboard,
@@ -9,32 +15,43 @@ from bot.keyboards import (
     retry_keyboard,
     subject_keyboard,
 )
+from bot.queue import AlreadyQueued, QueueFull, variant_queue
 from bot.states import CheckingAnswers, GenerateTasks
 from core.config import load_settings
+from core.metrics import GENERATE_SECONDS
 from db.base import get_session
-from db.models import Subject
+from db.cache import ActiveTaskSet, active_set_cache
+from db.models import GeneratedTask, Subject, TaskSet, User
 from db.repository import (
+    NewAttempt,
     calc_stats,
     create_task_set,
     get_latest_open_task_set,
-    get_task_by_order,
     get_task_set,
-    get_user,
+    get_task_set_tasks,
+    get_task_set_with_tasks,
     mark_task_set_completed,
     save_attempt,
+    save_graded_task_set,
+    set_task_set_file_id,
+    task_text,
 )
-from pdf.generator import build_pdf
-from tasks.checker import compare_answers
-from tasks.generator import TaskPayload, generate_tasks
+from db.writer import attempt_writer, sync_attempts
+from pdf.generator import pdf_filename
+from pdf.service import PdfRenderError, pdf_renderer, pdf_retention
+from tasks.checker import compare_answers, compare_answers_batch, parse_bulk_answers
+from tasks.generator import generate_tasks
+from utils.bloom import BloomFilter
 
 router = Router()
 settings = load_settings()
+# past this share of set bits the filter forgets everything: with 4 hashes
+# it would otherwise flag almost every task as seen
+SEEN_TASKS_MAX_FILL = 0.5
 
 
 @router.message(F.text == "Новый вариант")
-async def new_variant(message: Message, state: FSMContext) -> None:
-    async with get_session() as session:
-        user = await get_user(session, tg_id=message.from_user.id)
+async def new_variant(message: Message, state: FSMContext, user: Optional[User]) -> None:
     if not user:
         await message.answer("Сначала зарегистрируйтесь через /start.")
         return
@@ -62,7 +79,7 @@ async def pick_difficulty(callback: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.message(GenerateTasks.count)
-async def pick_count(message: Message, state: FSMContext) -> None:
+async def pick_count(message: Message, state: FSMContext, user: Optional[User]) -> None:
     try:
         count = int(message.text.strip())
     except ValueError:
@@ -74,36 +91,85 @@ async def pick_count(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     subject = Subject(data["subject"])
     difficulty = data.get("difficulty", "normal")
+    if not user:
+        await message.answer("Похоже, регистрация не завершена. Запустите /start.")
+        return
+
+    progress: Optional[Message] = None
+
+    async def show_position(position: int) -> None:
+        nonlocal progress
+        text = f"Вы {position}-й в очереди на генерацию варианта." if position else "Готовлю вариант…"
+        if progress is None:
+            progress = await message.answer(text)
+        else:
+            with suppress(TelegramBadRequest):
+                await progress.edit_text(text)
+
+    try:
+        await variant_queue.run(
+            user.id,
+            lambda: _create_variant(message, state, user, subject, count, difficulty),
+            notify=show_position,
+        )
+    except AlreadyQueued:
+        await message.answer("Ваш вариант уже готовится, дождитесь PDF.")
+    except QueueFull:
+        await message.answer("Сейчас слишком много запросов. Отправьте количество задач ещё раз через минуту.")
+    finally:
+        if progress is not None:
+            with suppress(TelegramBadRequest):
+                await progress.delete()
+
+
+async def _create_variant(
+    message: Message, state: FSMContext, user: User, subject: Subject, count: int, difficulty: str
+) -> None:
+    seen = _seen_tasks(user)
+    with GENERATE_SECONDS.time(subject=subject.value):
+        generated = generate_tasks(subject, count, difficulty=difficulty, seen=seen)
+    tasks_for_db = [
+        {
+            "topic": t.topic,
+            "answer": t.answer,
+            "difficulty": t.difficulty,
+            "generator_id": t.generator_id,
+            "generator_version": t.generator_version,
+            "params": t.params,
+        }
+        for t in generated
+    ]
+    seen_tasks = seen.to_bytes() if seen is not None else None
     async with get_session() as session:
-        user = await get_user(session, tg_id=message.from_user.id)
-        if not user:
-            await message.answer("Похоже, регистрация не завершена. Запустите /start.")
-            return
-        generated = generate_tasks(subject, count, difficulty=difficulty)
-        tasks_for_db = [{"topic": t.topic, "text": t.text, "answer": t.answer, "difficulty": t.difficulty} for t in generated]
-        task_set, tasks_db = await create_task_set(session, user_id=user.id, subject=subject, tasks=tasks_for_db)
-        pdf_path = build_pdf(task_set, tasks_db, user, pdf_dir=settings.pdf_dir, bot_name=settings.bot_name or None)
-    await message.answer_document(
-        FSInputFile(pdf_path),
-        caption=f"Ваш вариант по предмету: {subject.value}. Ответы вводите по порядку.\n"
-        "Формат ответа: десятичная дробь или целое (пример: 1.25). Округляйте до тысячных при необходимости.",
-        reply_markup=after_pdf_keyboard(),
-    )
+        task_set, tasks_db = await create_task_set(
+            session, user_id=user.id, subject=subject, tasks=tasks_for_db, seen_tasks=seen_tasks
+        )
+    if seen_tasks is not None:
+        user.seen_tasks = seen_tasks  # the User object cached by UserMiddleware
+    try:
+        await _send_task_set_pdf(message, task_set, user, tasks=tasks_db)
+    except PdfRenderError:
+        await message.answer(
+            "Не удалось подготовить PDF. Задачи сохранены — их можно решать через «Продолжить вариант».",
+            reply_markup=main_menu_keyboard(),
+        )
+        await state.clear()
+        return
+    active_set_cache.set(user.id, ActiveTaskSet(task_set, tasks_db))
     await state.update_data(task_set_id=task_set.id, current_order=1, total_tasks=task_set.total_tasks)
     await state.set_state(CheckingAnswers.current_order)
 
 
 @router.callback_query(F.data == "go_check")
-async def go_check(callback: CallbackQuery, state: FSMContext) -> None:
+async def go_check(callback: CallbackQuery, state: FSMContext, user: Optional[User]) -> None:
     data = await state.get_data()
     task_set_id = data.get("task_set_id")
     if not task_set_id:
+        if not user:
+            await callback.message.answer("Сначала зарегистрируйтесь через /start.")
+            await callback.answer()
+            return
         async with get_session() as session:
-            user = await get_user(session, tg_id=callback.from_user.id)
-            if not user:
-                await callback.message.answer("Сначала зарегистрируйтесь через /start.")
-                await callback.answer()
-                return
             open_set = await get_latest_open_task_set(session, user_id=user.id)
         if not open_set:
             await callback.message.answer("Нет открытых вариантов. Создайте новый.")
@@ -111,8 +177,30 @@ async def go_check(callback: CallbackQuery, state: FSMContext) -> None:
             return
         task_set_id = open_set.id
         await state.update_data(task_set_id=task_set_id, current_order=1, total_tasks=open_set.total_tasks)
+        await _resend_task_set_pdf(callback.message, open_set, user)
     await state.set_state(CheckingAnswers.current_order)
-    await _send_current_task(callback.message, state)
+    await _send_current_task(callback.message, state, user)
+    await callback.answer()
+
+
+@router.callback_query(F.data == "resend_pdf")
+async def resend_pdf(callback: CallbackQuery, state: FSMContext, user: Optional[User]) -> None:
+    if not user:
+        await callback.message.answer("Сначала зарегистрируйтесь через /start.")
+        await callback.answer()
+        return
+    data = await state.get_data()
+    task_set_id = data.get("task_set_id")
+    async with get_session() as session:
+        if task_set_id:
+            task_set = await get_task_set(session, task_set_id)
+        else:
+            task_set = await get_latest_open_task_set(session, user_id=user.id)
+    if not task_set or task_set.user_id != user.id:
+        await callback.message.answer("Вариант не найден. Создайте новый.")
+        await callback.answer()
+        return
+    await _resend_task_set_pdf(callback.message, task_set, user)
     await callback.answer()
 
 
@@ -124,130 +212,254 @@ async def go_menu(callback: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.message(F.text == "Проверить ответы")
-async def start_check_flow(message: Message, state: FSMContext) -> None:
+async def start_check_flow(message: Message, state: FSMContext, user: Optional[User]) -> None:
+    if not user:
+        await message.answer("Сначала зарегистрируйтесь через /start.")
+        return
     async with get_session() as session:
-        user = await get_user(session, tg_id=message.from_user.id)
-        if not user:
-            await message.answer("Сначала зарегистрируйтесь через /start.")
-            return
         open_set = await get_latest_open_task_set(session, user_id=user.id)
     if not open_set:
         await message.answer("У вас нет незавершённых вариантов. Сгенерируйте новый.")
         return
     await state.update_data(task_set_id=open_set.id, current_order=1, total_tasks=open_set.total_tasks)
     await state.set_state(CheckingAnswers.current_order)
-    await _send_current_task(message, state)
+    await _send_current_task(message, state, user)
 
 
 @router.message(F.text == "Продолжить вариант")
-async def continue_variant(message: Message, state: FSMContext) -> None:
+async def continue_variant(message: Message, state: FSMContext, user: Optional[User]) -> None:
+    if not user:
+        await message.answer("Сначала зарегистрируйтесь через /start.")
+        return
     async with get_session() as session:
-        user = await get_user(session, tg_id=message.from_user.id)
-        if not user:
-            await message.answer("Сначала зарегистрируйтесь через /start.")
-            return
         open_set = await get_latest_open_task_set(session, user_id=user.id)
     if not open_set:
         await message.answer("Нет незавершённых вариантов. Нажмите «Новый вариант».")
         return
     await state.update_data(task_set_id=open_set.id, current_order=1, total_tasks=open_set.total_tasks)
     await state.set_state(CheckingAnswers.current_order)
-    await _send_current_task(message, state)
+    await _resend_task_set_pdf(message, open_set, user)
+    await _send_current_task(message, state, user)
 
 
 @router.message(CheckingAnswers.current_order)
-async def process_answer(message: Message, state: FSMContext) -> None:
+async def process_answer(message: Message, state: FSMContext, user: Optional[User]) -> None:
+    if not user:
+        await message.answer("Сначала зарегистрируйтесь через /start.")
+        return
     data = await state.get_data()
-    task_set_id = data.get("task_set_id")
     current_order = data.get("current_order", 1)
-    total_tasks = data.get("total_tasks")
+    active = await _get_active_set(user, data.get("task_set_id"))
+    task = active.task(current_order) if active else None
+    if not task:
+        await message.answer("Не удалось найти задачу. Начните заново через /start.")
+        await state.clear()
+        return
+    answers = parse_bulk_answers(message.text or "")
+    if answers:
+        await _grade_bulk(message, state, user, active, answers, current_order)
+        return
+    is_correct = bool(compare_answers(task.correct_answer, message.text, correct_fixed=task.correct_answer_fixed))
+    finished = is_correct and current_order >= active.total_tasks
+    # The session is closed before the FSM calls below: with the database FSM
+    # storage they take a pool connection of their own.
     async with get_session() as session:
-        user = await get_user(session, tg_id=message.from_user.id)
-        if not user:
-            await message.answer("Сначала зарегистрируйтесь через /start.")
-            return
-        task = await get_task_by_order(session, task_set_id, current_order)
-        if not task:
-            await message.answer("Не удалось найти задачу. Начните заново через /start.")
-            await state.clear()
-            return
-        if total_tasks is None:
-            ts = await get_task_set(session, task_set_id)
-            total_tasks = ts.total_tasks if ts else 0
-            await state.update_data(total_tasks=total_tasks)
-        is_correct = bool(compare_answers(task.correct_answer, message.text))
-        await save_attempt(session, task=task, user=user, user_answer=message.text, is_correct=is_correct)
+        await _record_attempt(session, task=task, user=user, user_answer=message.text, is_correct=is_correct)
+        if finished:
+            await mark_task_set_completed(session, task.task_set_id)
+    if not is_correct:
+        await message.answer("Неверно. Попробуйте ещё раз или узнайте ответ.", reply_markup=retry_keyboard())
+        await state.update_data(last_incorrect_task=task.id)
+        return
+    await message.answer("Верно! Двигаемся дальше.")
+    await state.update_data(current_order=current_order + 1)
+    if finished:
+        active_set_cache.invalidate(user.id)
+        await _send_summary(message, user_id=user.id, task_set_id=task.task_set_id)
+        await state.clear()
+        return
+    await _send_current_task(message, state, user)
+
+
+async def _grade_bulk(
+    message: Message, state: FSMContext, user: User, active: ActiveTaskSet, answers: dict[int, str], current_order: int
+) -> None:
+    """Grade the rest of the variant from one message with numbered answers and close it.
+
+    Tasks before ``current_order`` were answered one by one already; numbers
+    outside the variant are ignored. Until every remaining task has an answer
+    nothing is recorded and the checking state is kept.
+    """
+    remaining = sorted((t for t in active.tasks if t.order_index >= current_order), key=lambda t: t.order_index)
+    missing = [str(task.order_index) for task in remaining if task.order_index not in answers]
+    if missing:
+        await message.answer(
+            f"Нет ответов на задачи: {', '.join(missing)}. Пришлите ответы на все оставшиеся задачи "
+            f"(с {current_order}-й) одним сообщением или отвечайте по одной."
+        )
+        return
+    results = compare_answers_batch(
+        (task.correct_answer, answers[task.order_index], task.correct_answer_fixed) for task in remaining
+    )
+    now = datetime.utcnow()
+    attempts = [
+        NewAttempt(task, user.id, answers[task.order_index], is_correct, False, now)
+        for task, is_correct in zip(remaining, results)
+    ]
+    async with get_session() as session:
+        await save_graded_task_set(session, active.task_set.id, attempts)
+    active_set_cache.invalidate(user.id)
+    await state.clear()
+
+    lines = [f"Проверка варианта №{active.task_set.id}:"]
+    if current_order == 2:
+        lines.append("Задача 1 проверена раньше.")
+    elif current_order > 2:
+        lines.append(f"Задачи 1–{current_order - 1} проверены раньше.")
+    for task, is_correct in zip(remaining, results):
+        n = task.order_index
         if is_correct:
-            await message.answer("Верно! Двигаемся дальше.")
-            next_order = current_order + 1
-            await state.update_data(current_order=next_order)
-            if next_order > (total_tasks or 0):
-                await mark_task_set_completed(session, task.task_set_id)
-                await _send_summary(message, session, user_id=user.id, task_set_id=task.task_set_id)
-                await state.clear()
-                return
-            await _send_current_task(message, state)
+            lines.append(f"{n}) {answers[n]} — верно")
         else:
-            await message.answer("Неверно. Попробуйте ещё раз или узнайте ответ.", reply_markup=retry_keyboard())
-            await state.update_data(last_incorrect_task=task.id)
+            lines.append(f"{n}) {answers[n]} — неверно, правильный ответ: {task.correct_answer}")
+    lines.append(f"Итого: {sum(results)} из {len(remaining)}.")
+    await message.answer("\n".join(lines), reply_markup=main_menu_keyboard())
 
 
 @router.callback_query(F.data == "retry")
-async def retry_answer(callback: CallbackQuery, state: FSMContext) -> None:
-    await _send_current_task(callback.message, state)
+async def retry_answer(callback: CallbackQuery, state: FSMContext, user: Optional[User]) -> None:
+    await _send_current_task(callback.message, state, user)
     await callback.answer()
 
 
 @router.callback_query(F.data == "show_answer")
-async def show_answer(callback: CallbackQuery, state: FSMContext) -> None:
+async def show_answer(callback: CallbackQuery, state: FSMContext, user: Optional[User]) -> None:
     data = await state.get_data()
-    task_set_id = data.get("task_set_id")
     current_order = data.get("current_order", 1)
-    total_tasks = data.get("total_tasks")
-    async with get_session() as session:
-        task = await get_task_by_order(session, task_set_id, current_order)
-        user = await get_user(session, tg_id=callback.from_user.id)
-        if task and user:
-            await save_attempt(session, task=task, user=user, user_answer="(подсмотр)", is_correct=False, looked_answer=True)
-        if total_tasks is None:
-            ts = await get_task_set(session, task_set_id)
-            total_tasks = ts.total_tasks if ts else 0
-            await state.update_data(total_tasks=total_tasks)
+    active = await _get_active_set(user, data.get("task_set_id")) if user else None
+    task = active.task(current_order) if active else None
     if not task:
         await callback.message.answer("Задача не найдена, начните заново.")
         await state.clear()
         await callback.answer()
         return
-    await callback.message.answer(f"Правильный ответ: {task.correct_answer}")
-    await state.update_data(current_order=current_order + 1)
+    finished = current_order >= active.total_tasks
     async with get_session() as session:
-        if current_order >= (total_tasks or 0):
+        await _record_attempt(session, task=task, user=user, user_answer="(подсмотр)", is_correct=False, looked_answer=True)
+        if finished:
             await mark_task_set_completed(session, task.task_set_id)
-            await callback.message.answer("Вариант завершён.", reply_markup=main_menu_keyboard())
-            await state.clear()
-        else:
-            await _send_current_task(callback.message, state)
+    await callback.message.answer(f"Правильный ответ: {task.correct_answer}")
+    await state.update_data(current_order=current_order + 1)
+    if finished:
+        active_set_cache.invalidate(user.id)
+        await callback.message.answer("Вариант завершён.", reply_markup=main_menu_keyboard())
+        await state.clear()
+    else:
+        await _send_current_task(callback.message, state, user)
     await callback.answer()
 
 
-async def _send_current_task(message: Message, state: FSMContext) -> None:
+async def _record_attempt(
+    session, task: GeneratedTask, user: User, user_answer: str, is_correct: bool, looked_answer: bool = False
+) -> None:
+    # a full write-behind queue falls back to a direct write
+    if attempt_writer is None or not attempt_writer.submit(task, user.id, user_answer, is_correct, looked_answer):
+        await save_attempt(
+            session, task=task, user=user, user_answer=user_answer, is_correct=is_correct, looked_answer=looked_answer
+        )
+
+
+def _seen_tasks(user: User) -> Optional[BloomFilter]:
+    """The student's filter of tasks already given, or None when disabled."""
+    if settings.seen_tasks_bits <= 0:
+        return None
+    seen = BloomFilter(settings.seen_tasks_bits, data=user.seen_tasks)
+    if seen.fill_ratio() > SEEN_TASKS_MAX_FILL:
+        seen.clear()
+    return seen
+
+
+async def _get_active_set(user: User, task_set_id: Optional[int]) -> Optional[ActiveTaskSet]:
+    """Task set being checked with all its tasks, loaded once per checking session."""
+    if not task_set_id:
+        return None
+    active = active_set_cache.get(user.id)
+    if active is not None and active.task_set.id == task_set_id:
+        return active
+    async with get_session() as session:
+        loaded = await get_task_set_with_tasks(session, task_set_id)
+    if loaded is None or loaded[0].user_id != user.id:
+        return None
+    active = ActiveTaskSet(*loaded)
+    active_set_cache.set(user.id, active)
+    return active
+
+
+async def _send_task_set_pdf(
+    message: Message,
+    task_set: TaskSet,
+    user: User,
+    tasks: Optional[list[GeneratedTask]] = None,
+) -> None:
+    """Send the variant PDF, reusing the Telegram file_id once it has been uploaded."""
+    caption = (
+        f"Ваш вариант по предмету: {task_set.subject.value}. Ответы вводите по порядку.\n"
+        "Формат ответа: десятичная дробь или целое (пример: 1.25). Округляйте до тысячных при необходимости."
+    )
+    if task_set.pdf_file_id:
+        try:
+            await message.answer_document(task_set.pdf_file_id, caption=caption, reply_markup=after_pdf_keyboard())
+            return
+        except TelegramBadRequest:
+            # file_id is bound to the bot token; after a token change upload again
+            pass
+    pdf_bytes = None
+    if tasks is None and pdf_renderer.archive_dir is not None:
+        pdf_bytes = await asyncio.to_thread(pdf_retention.load, task_set.id)
+    if pdf_bytes is None:
+        # new variant, or the archived copy was evicted: render from the stored tasks
+        if tasks is None:
+            async with get_session() as session:
+                tasks = await get_task_set_tasks(session, task_set.id)
+        pdf_bytes = await pdf_renderer.render(task_set, tasks, user)
+    sent = await message.answer_document(
+        BufferedInputFile(pdf_bytes, filename=pdf_filename(task_set.id)),
+        caption=caption,
+        reply_markup=after_pdf_keyboard(),
+    )
+    if sent.document:
+        task_set.pdf_file_id = sent.document.file_id
+        async with get_session() as session:
+            await set_task_set_file_id(session, task_set.id, sent.document.file_id)
+
+
+async def _resend_task_set_pdf(message: Message, task_set: TaskSet, user: User) -> None:
+    try:
+        await _send_task_set_pdf(message, task_set, user)
+    except PdfRenderError:
+        await message.answer("Не удалось подготовить PDF, попробуйте позже.")
+
+
+async def _send_current_task(message: Message, state: FSMContext, user: Optional[User]) -> None:
     data = await state.get_data()
-    task_set_id = data.get("task_set_id")
     current_order = data.get("current_order", 1)
-    async with get_session() as session:
-        task = await get_task_by_order(session, task_set_id, current_order)
+    active = await _get_active_set(user, data.get("task_set_id")) if user else None
+    task = active.task(current_order) if active else None
     if not task:
         await message.answer("Не удалось найти текущую задачу. Начните заново /start.")
         await state.clear()
         return
     await message.answer(
-        f"Задача {task.order_index} (уровень {task.difficulty}):\n{task.text}\n"
+        f"Задача {task.order_index} (уровень {task.difficulty}):\n{task_text(task)}\n"
         "Ответ: десятичная дробь или целое (пример: 1.25). Без обыкновенных дробей."
+        + ("\nМожно прислать все ответы одним сообщением: 1) 2.5 2) -3 3) 0,75" if current_order == 1 else "")
     )
 
 
-async def _send_summary(message: Message, session, user_id: int, task_set_id: int) -> None:
-    stats = await calc_stats(session, user_id=user_id)
+async def _send_summary(message: Message, user_id: int, task_set_id: int) -> None:
+    await sync_attempts(user_id)
+    async with get_session() as session:
+        stats = await calc_stats(session, user_id=user_id)
     total = stats["total_attempts"]
     correct = stats["total_correct"]
     await message.answer(
@@ -46,6 +46,7 @@ def after_pdf_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="Перейти к проверке", callback_data="go_check")],
+            [InlineKeyboardButton(text="Скачать вариант ещё раз", callback_data="resend_pdf")],
             [InlineKeyboardButton(text="В главное меню", callback_data="go_menu")],
         ]
     )
@@ -0,0 +1,63 @@
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from core.metrics import HANDLER_ERRORS, HANDLER_SECONDS
+from db.base import get_session
+from db.cache import user_cache
+from db.repository import get_user
+
+
+class UserMiddleware(BaseMiddleware):
+    """Resolve the registered ``User`` once per update and pass it to handlers as ``user``.
+
+    Lookups go through ``db.cache.user_cache``; unregistered users get
+    ``user=None`` and are looked up again on the next update.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        from_user = data.get("event_from_user")
+        user = None
+        if from_user is not None:
+            user = user_cache.get(from_user.id)
+            if user is None:
+                async with get_session() as session:
+                    user = await get_user(session, tg_id=from_user.id)
+                if user is not None:
+                    user_cache.set(from_user.id, user)
+        data["user"] = user
+        return await handler(event, data)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Time every matched handler into ``bot_handler_seconds``.
+
+    Registered as an inner middleware, so only updates that reach a handler are
+    measured; the ``handler`` label is ``<module>.<function>``, e.g.
+    ``tasks.process_answer``.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        callback = getattr(handler_object, "callback", None)
+        name = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}" if callback else "unknown"
+        started = perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(perf_counter() - started, handler=name)
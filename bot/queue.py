@@ -0,0 +1,128 @@
+"""Admission control for variant generation.
+
+Generating a variant (tasks, database write, PDF render) runs through
+``VariantQueue``: at most ``max_concurrency`` jobs at a time, one queued or
+running job per user, and at most ``max_waiting`` jobs waiting. Beyond that
+``QueueFull`` is raised right away so the handler can ask the user to retry
+instead of making everyone wait longer. Waiting users get their place in
+the queue through ``notify``, refreshed every ``progress_interval`` seconds
+at most, which keeps message edits within Telegram's rate limits.
+"""
+import asyncio
+import logging
+from collections import deque
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from core.config import load_settings
+from core.metrics import QUEUE_DEPTH, VARIANTS_RUNNING
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Notify = Callable[[int], Awaitable[None]]
+
+
+class QueueFull(Exception):
+    pass
+
+
+class AlreadyQueued(Exception):
+    pass
+
+
+@dataclass(eq=False)
+class _Ticket:
+    user_id: int
+    ready: asyncio.Future
+    notify: Optional[Notify]
+    shown: int = 0
+
+
+class VariantQueue:
+    def __init__(self, max_concurrency: int, max_waiting: int, progress_interval: float = 3.0) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.progress_interval = progress_interval
+        self._running = 0
+        self._waiting: deque[_Ticket] = deque()
+        self._users: set[int] = set()
+        self._refresher: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    async def run(self, user_id: int, job: Callable[[], Awaitable[T]], notify: Optional[Notify] = None) -> T:
+        """Run ``job`` once a slot is free; ``notify(n)`` reports the place n, 0 on start."""
+        if user_id in self._users:
+            raise AlreadyQueued(user_id)
+        must_wait = self._running >= self.max_concurrency or bool(self._waiting)
+        if must_wait and len(self._waiting) >= self.max_waiting:
+            raise QueueFull(user_id)
+        self._users.add(user_id)
+        try:
+            if must_wait:
+                await self._wait_turn(user_id, notify)
+            else:
+                self._running += 1
+            try:
+                return await job()
+            finally:
+                self._running -= 1
+                self._start_next()
+        finally:
+            self._users.discard(user_id)
+
+    async def _wait_turn(self, user_id: int, notify: Optional[Notify]) -> None:
+        ticket = _Ticket(user_id, asyncio.get_running_loop().create_future(), notify)
+        self._waiting.append(ticket)
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_positions())
+        try:
+            await self._notify(ticket, len(self._waiting))
+            await ticket.ready
+        except asyncio.CancelledError:
+            if ticket.ready.done() and not ticket.ready.cancelled():
+                # the slot was handed over just before the cancellation
+                self._running -= 1
+                self._start_next()
+            else:
+                with suppress(ValueError):
+                    self._waiting.remove(ticket)
+            raise
+        if ticket.shown:
+            await self._notify(ticket, 0)
+
+    def _start_next(self) -> None:
+        while self._waiting and self._running < self.max_concurrency:
+            ticket = self._waiting.popleft()
+            self._running += 1
+            ticket.ready.set_result(None)
+
+    async def _notify(self, ticket: _Ticket, position: int) -> None:
+        if ticket.notify is None or ticket.shown == position:
+            return
+        ticket.shown = position
+        try:
+            await ticket.notify(position)
+        except Exception:
+            logger.exception("Queue progress notification failed")
+
+    async def _refresh_positions(self) -> None:
+        while self._waiting:
+            await asyncio.sleep(self.progress_interval)
+            for position, ticket in enumerate(list(self._waiting), start=1):
+                if not ticket.ready.done():
+                    await self._notify(ticket, position)
+
+
+settings = load_settings()
+variant_queue = VariantQueue(max_concurrency=settings.variant_concurrency, max_waiting=settings.variant_queue_size)
+QUEUE_DEPTH.track(lambda: variant_queue.waiting, queue="variant")
+VARIANTS_RUNNING.track(lambda: variant_queue.running)
@@ -0,0 +1,156 @@
+"""aiogram FSM storage kept in the bot database.
+
+States survive restarts and are visible to every bot process using the same
+``DATABASE_URL``. Each write goes to the database first and then into an
+in-process ``TTLCache``, so reads of a recently used state cost no query.
+The cache is per process: if several processes serve the same user without
+sticky routing, keep ``FSM_CACHE_TTL`` short (or 0 to disable it). States
+idle for longer than ``FSM_STATE_TTL_HOURS`` are treated as absent and removed by
+``run_purge``.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Mapping, NamedTuple, Optional
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import Settings
+from core.metrics import FSM_STATES
+from db.engine import upsert_insert
+from db.models import FsmRecord
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry(NamedTuple):
+    state: Optional[str]
+    data: dict[str, Any]
+    updated_at: Optional[datetime] = None  # None: nothing stored
+
+
+_EMPTY = _Entry(None, {})
+
+
+class SQLAlchemyStorage(BaseStorage):
+    def __init__(
+        self,
+        sessions: async_sessionmaker[AsyncSession],
+        cache_size: int,
+        cache_ttl: float,
+        state_ttl: float,
+        key_builder: Optional[KeyBuilder] = None,
+    ) -> None:
+        self.sessions = sessions
+        self.state_ttl = state_ttl
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self._cache: Optional[TTLCache[str, _Entry]] = TTLCache(cache_size, cache_ttl) if cache_ttl > 0 else None
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.state_ttl)
+
+    async def _load(self, key: str) -> _Entry:
+        if self._cache is not None:
+            entry = self._cache.get(key)
+            if entry is not None:
+                # the cache may outlive the state: expire it like the database does
+                if self.state_ttl and entry.updated_at is not None and entry.updated_at < self._cutoff():
+                    entry = _EMPTY
+                    self._cache.set(key, entry)
+                return entry
+        stmt = select(FsmRecord.state, FsmRecord.data, FsmRecord.updated_at).where(FsmRecord.key == key)
+        if self.state_ttl:
+            stmt = stmt.where(FsmRecord.updated_at >= self._cutoff())
+        async with self.sessions() as session:
+            row = (await session.execute(stmt)).one_or_none()
+        entry = _Entry(row.state, json.loads(row.data), row.updated_at) if row else _EMPTY
+        if self._cache is not None:
+            self._cache.set(key, entry)
+        return entry
+
+    async def _store(self, key: str, entry: _Entry) -> None:
+        async with self.sessions() as session:
+            if entry.state is None and not entry.data:
+                entry = _EMPTY
+                await session.execute(delete(FsmRecord).where(FsmRecord.key == key))
+            else:
+                entry = entry._replace(updated_at=datetime.utcnow())
+                values = {"state": entry.state, "data": json.dumps(entry.data), "updated_at": entry.updated_at}
+                stmt = upsert_insert(session.bind.dialect.name)(FsmRecord).values(key=key, **values)
+                await session.execute(stmt.on_conflict_do_update(index_elements=[FsmRecord.key], set_=values))
+            await session.commit()
+        if self._cache is not None:
+            self._cache.set(key, entry)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        current = await self._load(storage_key)
+        await self._store(storage_key, current._replace(state=state.state if isinstance(state, State) else state))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._load(self.key_builder.build(key))).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        storage_key = self.key_builder.build(key)
+        current = await self._load(storage_key)
+        await self._store(storage_key, current._replace(data=dict(data)))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return dict((await self._load(self.key_builder.build(key))).data)
+
+    async def purge(self) -> int:
+        """Delete states idle for longer than ``state_ttl``."""
+        if not self.state_ttl:
+            return 0
+        async with self.sessions() as session:
+            result = await session.execute(delete(FsmRecord).where(FsmRecord.updated_at < self._cutoff()))
+            await session.commit()
+        return result.rowcount
+
+    async def count_states(self) -> dict[Optional[str], int]:
+        """Live records per state; records holding only data are counted under ``None``."""
+        stmt = select(FsmRecord.state, func.count()).group_by(FsmRecord.state)
+        if self.state_ttl:
+            stmt = stmt.where(FsmRecord.updated_at >= self._cutoff())
+        async with self.sessions() as session:
+            return {state: count for state, count in (await session.execute(stmt)).all()}
+
+    async def update_metrics(self) -> None:
+        counts = await self.count_states()
+        FSM_STATES.clear()
+        for state, count in counts.items():
+            FSM_STATES.set(count, state=state or "none")
+
+    async def run_purge(self, interval: float = 3600.0) -> None:
+        while True:
+            try:
+                removed = await self.purge()
+                if removed:
+                    logger.info("Removed %d idle FSM states", removed)
+            except SQLAlchemyError:
+                logger.exception("FSM purge failed")
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        pass
+
+
+def build_fsm_storage(settings: Settings, sessions: async_sessionmaker[AsyncSession]) -> BaseStorage:
+    if settings.fsm_storage == "memory":
+        return MemoryStorage()
+    return SQLAlchemyStorage(
+        sessions,
+        cache_size=settings.fsm_cache_size,
+        cache_ttl=settings.fsm_cache_ttl,
+        state_ttl=settings.fsm_state_ttl_hours * 3600,
+    )
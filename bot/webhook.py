@@ -0,0 +1,160 @@
+"""Webhook entry point: updates served by an embedded aiohttp server.
+
+Each POST is answered right away and its update is processed in the
+background, at most ``max_concurrency`` at a time. When ``max_pending``
+updates are already waiting the server answers 503 and Telegram redelivers
+the update later. On shutdown new requests get 503 while the accepted
+updates are drained for up to ``drain_timeout`` seconds.
+
+Local check without Telegram: start with ``BOT_MODE=webhook`` and POST a
+recorded update::
+
+    curl -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET" \\
+         -H "Content-Type: application/json" \\
+         -d @update.json http://127.0.0.1:8080/webhook
+"""
+import asyncio
+import logging
+import secrets
+import signal
+from contextlib import suppress
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import setup_application
+from aiohttp import web
+
+from core.config import Settings
+from core.metrics import QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class BoundedRequestHandler:
+    """aiohttp handler for webhook updates with a bounded background queue.
+
+    Built on public calls only (``Dispatcher.feed_raw_update`` and
+    ``silent_call_request``) rather than on aiogram's request handler
+    internals, which change between minor releases.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        secret_token: str,
+        max_concurrency: int,
+        max_pending: int,
+        drain_timeout: float,
+        **data: Any,
+    ) -> None:
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret_token = secret_token
+        self.max_pending = max_pending
+        self.drain_timeout = drain_timeout
+        self.data = data
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        self._closing = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def register(self, app: web.Application, path: str) -> None:
+        app.router.add_post(path, self.handle)
+        app.on_shutdown.append(self._on_shutdown)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not secrets.compare_digest(token.encode(), self.secret_token.encode()):
+            return web.Response(status=401, text="Unauthorized")
+        if self._closing or self.pending >= self.max_pending:
+            return web.Response(status=503, text="Busy")
+        try:
+            update = await request.json(loads=self.bot.session.json_loads)
+        except ValueError:
+            return web.Response(status=400, text="Bad update")
+        task = asyncio.create_task(self._feed_update(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response({}, dumps=self.bot.session.json_dumps)
+
+    async def _feed_update(self, update: dict[str, Any]) -> None:
+        async with self._slots:
+            # handler errors are already logged by the dispatcher; keep them
+            # from resurfacing as "Task exception was never retrieved"
+            with suppress(Exception):
+                result = await self.dispatcher.feed_raw_update(self.bot, update, **self.data)
+                if isinstance(result, TelegramMethod):
+                    await self.dispatcher.silent_call_request(self.bot, result)
+
+    async def drain(self) -> None:
+        """Stop accepting updates and wait for the accepted ones."""
+        self._closing = True
+        tasks = set(self._tasks)
+        if not tasks:
+            return
+        logger.info("Draining %d webhook updates", len(tasks))
+        _, unfinished = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            logger.warning("Cancelled %d updates still running after %.0f s", len(unfinished), self.drain_timeout)
+
+    async def _on_shutdown(self, app: web.Application) -> None:
+        await self.drain()
+        await self.bot.session.close()
+
+
+def build_webhook_app(dispatcher: Dispatcher, bot: Bot, settings: Settings) -> web.Application:
+    app = web.Application()
+    handler = BoundedRequestHandler(
+        dispatcher,
+        bot,
+        secret_token=settings.webhook_secret,
+        max_concurrency=settings.webhook_max_concurrency,
+        max_pending=settings.webhook_max_pending,
+        drain_timeout=settings.webhook_drain_timeout,
+    )
+    handler.register(app, path=settings.webhook_path)
+    setup_application(app, dispatcher, bot=bot)
+    app["webhook_handler"] = handler
+    QUEUE_DEPTH.track(lambda: handler.pending, queue="webhook")
+    return app
+
+
+async def run_webhook(dispatcher: Dispatcher, bot: Bot, settings: Settings) -> None:
+    """Serve webhook updates until SIGINT/SIGTERM, then drain and stop."""
+    if not settings.webhook_secret:
+        raise RuntimeError("WEBHOOK_SECRET is required in webhook mode")
+    app = build_webhook_app(dispatcher, bot, settings)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, settings.webhook_host, settings.webhook_port)
+    await site.start()
+    logger.info("Webhook server listening on %s:%d%s", settings.webhook_host, settings.webhook_port, settings.webhook_path)
+    if settings.webhook_url:
+        await bot.set_webhook(
+            settings.webhook_url.rstrip("/") + settings.webhook_path,
+            secret_token=settings.webhook_secret,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):  # Windows
+            loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+        logger.info("Stopping webhook server")
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with suppress(NotImplementedError):
+                loop.remove_signal_handler(sig)
+        await runner.cleanup()
@@ -11,6 +11,50 @@ class Settings:
     database_url: str
     pdf_dir: Path
     bot_name: str
+    pdf_workers: int = 2
+    pdf_render_timeout: float = 30.0
+    pdf_worker_max_tasks: int = 100
+    pdf_archive: bool = False
+    pdf_dir_max_mb: int = 500
+    pdf_max_age_days: float = 30.0
+    pdf_retention_interval: float = 600.0
+    user_cache_size: int = 10000
+    user_cache_ttl: float = 300.0
+    active_set_cache_size: int = 2000
+    active_set_cache_ttl: float = 3600.0
+    teacher_ids: frozenset[int] = frozenset()
+    rollup_interval: float = 900.0
+    attempt_write_behind: bool = False
+    attempt_flush_ms: int = 50
+    attempt_batch_size: int = 200
+    attempt_max_pending: int = 10000
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_mb: int = 256
+    sqlite_cache_mb: int = 64
+    pg_pool_size: int = 10
+    pg_max_overflow: int = 20
+    pg_pool_pre_ping: bool = True
+    pg_statement_cache_size: int = 100
+    fsm_storage: str = "db"
+    fsm_cache_size: int = 10000
+    fsm_cache_ttl: float = 30.0
+    fsm_state_ttl_hours: float = 168.0
+    bot_mode: str = "polling"
+    webhook_url: str = ""
+    webhook_path: str = "/webhook"
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_secret: str = ""
+    webhook_max_concurrency: int = 64
+    webhook_max_pending: int = 1000
+    webhook_drain_timeout: float = 30.0
+    variant_concurrency: int = 4
+    variant_queue_size: int = 200
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
+    seen_tasks_bits: int = 8192
 
 
 def load_settings() -> Settings:
@@ -22,4 +66,97 @@ def load_settings() -> Settings:
     pdf_dir = Path(os.getenv("PDF_DIR", "./generated_pdfs")).resolve()
     pdf_dir.mkdir(parents=True, exist_ok=True)
     bot_name = os.getenv("BOT_NAME", "").lstrip("@")
-    return Settings(bot_token=bot_token, database_url=database_url, pdf_dir=pdf_dir, bot_name=bot_name)
+    pdf_workers = int(os.getenv("PDF_WORKERS", "2"))
+    pdf_render_timeout = float(os.getenv("PDF_RENDER_TIMEOUT", "30"))
+    pdf_worker_max_tasks = int(os.getenv("PDF_WORKER_MAX_TASKS", "100"))
+    pdf_archive = os.getenv("PDF_ARCHIVE", "0").lower() in {"1", "true", "yes"}
+    pdf_dir_max_mb = int(os.getenv("PDF_DIR_MAX_MB", "500"))
+    pdf_max_age_days = float(os.getenv("PDF_MAX_AGE_DAYS", "30"))
+    pdf_retention_interval = float(os.getenv("PDF_RETENTION_INTERVAL", "600"))
+    user_cache_size = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    user_cache_ttl = float(os.getenv("USER_CACHE_TTL", "300"))
+    active_set_cache_size = int(os.getenv("ACTIVE_SET_CACHE_SIZE", "2000"))
+    active_set_cache_ttl = float(os.getenv("ACTIVE_SET_CACHE_TTL", "3600"))
+    teacher_ids = frozenset(int(tg_id) for tg_id in os.getenv("TEACHER_IDS", "").replace(",", " ").split())
+    rollup_interval = float(os.getenv("ROLLUP_INTERVAL", "900"))
+    attempt_write_behind = os.getenv("ATTEMPT_WRITE_BEHIND", "0").lower() in {"1", "true", "yes"}
+    attempt_flush_ms = int(os.getenv("ATTEMPT_FLUSH_MS", "50"))
+    attempt_batch_size = int(os.getenv("ATTEMPT_BATCH_SIZE", "200"))
+    attempt_max_pending = int(os.getenv("ATTEMPT_MAX_PENDING", "10000"))
+    sqlite_journal_mode = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+    sqlite_synchronous = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+    sqlite_busy_timeout_ms = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    sqlite_mmap_mb = int(os.getenv("SQLITE_MMAP_MB", "256"))
+    sqlite_cache_mb = int(os.getenv("SQLITE_CACHE_MB", "64"))
+    pg_pool_size = int(os.getenv("PG_POOL_SIZE", "10"))
+    pg_max_overflow = int(os.getenv("PG_MAX_OVERFLOW", "20"))
+    pg_pool_pre_ping = os.getenv("PG_POOL_PRE_PING", "1").lower() in {"1", "true", "yes"}
+    pg_statement_cache_size = int(os.getenv("PG_STATEMENT_CACHE_SIZE", "100"))
+    fsm_storage = os.getenv("FSM_STORAGE", "db").lower()
+    fsm_cache_size = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+    fsm_cache_ttl = float(os.getenv("FSM_CACHE_TTL", "30"))
+    fsm_state_ttl_hours = float(os.getenv("FSM_STATE_TTL_HOURS", "168"))
+    bot_mode = os.getenv("BOT_MODE", "polling").lower()
+    webhook_url = os.getenv("WEBHOOK_URL", "")
+    webhook_path = os.getenv("WEBHOOK_PATH", "/webhook")
+    webhook_host = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    webhook_port = int(os.getenv("WEBHOOK_PORT", "8080"))
+    webhook_secret = os.getenv("WEBHOOK_SECRET", "")
+    webhook_max_concurrency = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "64"))
+    webhook_max_pending = int(os.getenv("WEBHOOK_MAX_PENDING", "1000"))
+    webhook_drain_timeout = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))
+    variant_concurrency = int(os.getenv("VARIANT_CONCURRENCY", "4"))
+    variant_queue_size = int(os.getenv("VARIANT_QUEUE_SIZE", "200"))
+    metrics_host = os.getenv("METRICS_HOST", "127.0.0.1")
+    metrics_port = int(os.getenv("METRICS_PORT", "0"))
+    seen_tasks_bits = int(os.getenv("SEEN_TASKS_BITS", "8192"))
+    return Settings(
+        bot_token=bot_token,
+        database_url=database_url,
+        pdf_dir=pdf_dir,
+        bot_name=bot_name,
+        pdf_workers=pdf_workers,
+        pdf_render_timeout=pdf_render_timeout,
+        pdf_worker_max_tasks=pdf_worker_max_tasks,
+        pdf_archive=pdf_archive,
+        pdf_dir_max_mb=pdf_dir_max_mb,
+        pdf_max_age_days=pdf_max_age_days,
+        pdf_retention_interval=pdf_retention_interval,
+        user_cache_size=user_cache_size,
+        user_cache_ttl=user_cache_ttl,
+        active_set_cache_size=active_set_cache_size,
+        active_set_cache_ttl=active_set_cache_ttl,
+        teacher_ids=teacher_ids,
+        rollup_interval=rollup_interval,
+        attempt_write_behind=attempt_write_behind,
+        attempt_flush_ms=attempt_flush_ms,
+        attempt_batch_size=attempt_batch_size,
+        attempt_max_pending=attempt_max_pending,
+        sqlite_journal_mode=sqlite_journal_mode,
+        sqlite_synchronous=sqlite_synchronous,
+        sqlite_busy_timeout_ms=sqlite_busy_timeout_ms,
+        sqlite_mmap_mb=sqlite_mmap_mb,
+        sqlite_cache_mb=sqlite_cache_mb,
+        pg_pool_size=pg_pool_size,
+        pg_max_overflow=pg_max_overflow,
+        pg_pool_pre_ping=pg_pool_pre_ping,
+        pg_statement_cache_size=pg_statement_cache_size,
+        fsm_storage=fsm_storage,
+        fsm_cache_size=fsm_cache_size,
+        fsm_cache_ttl=fsm_cache_ttl,
+        fsm_state_ttl_hours=fsm_state_ttl_hours,
+        bot_mode=bot_mode,
+        webhook_url=webhook_url,
+        webhook_path=webhook_path,
+        webhook_host=webhook_host,
+        webhook_port=webhook_port,
+        webhook_secret=webhook_secret,
+        webhook_max_concurrency=webhook_max_concurrency,
+        webhook_max_pending=webhook_max_pending,
+        webhook_drain_timeout=webhook_drain_timeout,
+        variant_concurrency=variant_concurrency,
+        variant_queue_size=variant_queue_size,
+        metrics_host=metrics_host,
+        metrics_port=metrics_port,
+        seen_tasks_bits=seen_tasks_bits,
+    )
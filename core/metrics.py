@@ -0,0 +1,231 @@
+"""In-process metrics served in the Prometheus text format.
+
+Metrics live in the module-level ``registry``; ``start_metrics_server``
+exposes it as ``GET /metrics`` on ``METRICS_HOST:METRICS_PORT``. Values are
+kept per process and reset on restart, as Prometheus expects.
+
+Gauges either hold a value set by the code (``set``) or read it at scrape
+time from a callback (``track``). Async hooks added with
+``registry.on_collect`` run before every scrape, for values that need a
+query such as the FSM state counts.
+"""
+import logging
+import math
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterable, Iterator, Optional, Sequence, TypeVar
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+LabelValues = tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+        self._sources: dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def clear(self) -> None:
+        self._values.clear()
+
+    def track(self, source: Callable[[], float], **labels: str) -> None:
+        """Read the value from ``source()`` at scrape time."""
+        self._sources[self._key(labels)] = source
+
+    def samples(self) -> Iterable[str]:
+        values = dict(self._values)
+        for key, source in self._sources.items():
+            try:
+                values[key] = source()
+            except Exception:
+                logger.exception("Gauge %s source failed", self.name)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # per label set: bucket counts (not cumulative), sum
+        self._series: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([0] * len(self.buckets), [0.0])
+        counts, total = series
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterable[str]:
+        bucket_labels = self.labelnames + ("le",)
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(bucket_labels, key + (_format_value(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total[0])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+M = TypeVar("M", bound=_Metric)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._hooks: list[Callable[[], Awaitable[None]]] = []
+
+    def register(self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def on_collect(self, hook: Callable[[], Awaitable[None]]) -> None:
+        self._hooks.append(hook)
+
+    async def render(self) -> str:
+        for hook in self._hooks:
+            try:
+                await hook()
+            except Exception:
+                logger.exception("Metrics collect hook failed")
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+HANDLER_SECONDS = registry.register(Histogram("bot_handler_seconds", "Time spent in bot handlers.", ["handler"]))
+HANDLER_ERRORS = registry.register(
+    Counter("bot_handler_errors_total", "Bot handlers that raised an exception.", ["handler"])
+)
+SQL_SECONDS = registry.register(
+    Histogram("db_statement_seconds", "SQL statement execution time by statement type.", ["operation"])
+)
+PDF_RENDER_SECONDS = registry.register(
+    Histogram(
+        "pdf_render_seconds",
+        "PDF rendering time in the worker pool, queueing excluded.",
+        ["kind"],
+        buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+    )
+)
+GENERATE_SECONDS = registry.register(
+    Histogram("tasks_generate_seconds", "Time to generate the tasks of one variant.", ["subject"])
+)
+QUEUE_DEPTH = registry.register(Gauge("queue_depth", "Items waiting in in-process queues.", ["queue"]))
+VARIANTS_RUNNING = registry.register(Gauge("variant_jobs_running", "Variants being generated right now."))
+FSM_STATES = registry.register(Gauge("fsm_states", "Stored FSM states by state name.", ["state"]))
+
+
+async def _metrics_view(request: web.Request) -> web.Response:
+    body = await request.app["metrics_registry"].render()
+    return web.Response(text=body, content_type="text/plain", charset="utf-8")
+
+
+def build_metrics_app(metrics: Optional[Registry] = None) -> web.Application:
+    app = web.Application()
+    app["metrics_registry"] = metrics or registry
+    app.router.add_get("/metrics", _metrics_view)
+    return app
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Serve ``registry`` on ``http://host:port/metrics``; call ``cleanup()`` on the result to stop."""
+    runner = web.AppRunner(build_metrics_app(), access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError:
+        await runner.cleanup()
+        raise
+    logger.info("Metrics available on http://%s:%d/metrics", host, port)
+    return runner
+
@@ -1,12 +1,18 @@
 from contextlib import asynccontextmanager
+from typing import Callable
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import Column, Integer, MetaData, Table, bindparam, inspect, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from core.config import load_settings
 from db import models
+from db.engine import create_engine
+from db.stats import rebuild_statements
+from tasks.checker import to_fixed
 
 settings = load_settings()
-engine = create_async_engine(settings.database_url, echo=False, future=True)
+engine = create_engine(settings)
 AsyncSessionFactory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 
@@ -16,6 +22,100 @@ async def get_session() -> AsyncSession:
         yield session
 
 
+def _add_missing_columns(conn: Connection) -> None:
+    """Add columns that exist in the models but not in an older database.
+
+    ``create_all`` only creates missing tables; new columns must be nullable
+    (or have a server default) to be added this way.
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in models.Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+def _create_missing_indexes(conn: Connection) -> None:
+    """Create model indexes that an older database does not have yet."""
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _backfill_stats(conn: Connection) -> None:
+    """Fill the statistics counters from the attempts already stored."""
+    for stmt in rebuild_statements():
+        conn.execute(stmt)
+
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def _backfill_answer_fixed(conn: Connection) -> None:
+    """Fill GeneratedTask.correct_answer_fixed for tasks created before the column.
+
+    Goes through the tasks in id order, one committed batch at a time, so a
+    large database is neither loaded into memory nor locked for the whole run.
+    Answers the checker cannot parse stay NULL.
+    """
+    tasks = models.GeneratedTask.__table__
+    stmt = update(tasks).where(tasks.c.id == bindparam("task_id")).values(correct_answer_fixed=bindparam("fixed"))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(tasks.c.id, tasks.c.correct_answer)
+            .where(tasks.c.correct_answer_fixed.is_(None), tasks.c.id > last_id)
+            .order_by(tasks.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        values = [{"task_id": row.id, "fixed": to_fixed(row.correct_answer)} for row in rows]
+        values = [value for value in values if value["fixed"] is not None]
+        if values:
+            conn.execute(stmt, values)
+        conn.commit()
+
+
+# Versioned schema changes that create_all cannot apply to an existing
+# database. Append new steps with the next number; never renumber. Each step
+# is committed with its version; a step that commits on its own must be safe
+# to run again after an interruption.
+MIGRATIONS: list[tuple[int, Callable[[Connection], None]]] = [
+    (1, _create_missing_indexes),
+    (2, _backfill_stats),
+    (3, _create_missing_indexes),
+    (4, _backfill_answer_fixed),
+]
+
+_schema_meta = MetaData()
+schema_version = Table("schema_version", _schema_meta, Column("version", Integer, nullable=False))
+
+
+def _migrate(conn: Connection) -> None:
+    _schema_meta.create_all(conn)
+    current = conn.execute(select(schema_version.c.version)).scalar()
+    if current is None:
+        current = 0
+        conn.execute(schema_version.insert().values(version=0))
+    for version, step in MIGRATIONS:
+        if version <= current:
+            continue
+        step(conn)
+        conn.execute(schema_version.update().values(version=version))
+        conn.commit()
+
+
 async def init_db() -> None:
-    async with engine.begin() as conn:
+    async with engine.connect() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_migrate)
+        await conn.commit()
@@ -0,0 +1,35 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+from core.config import load_settings
+from db.models import GeneratedTask, TaskSet, User
+from utils.cache import TTLCache
+
+
+@dataclass
+class ActiveTaskSet:
+    """A task set being checked, with all its tasks (detached ORM objects)."""
+
+    task_set: TaskSet
+    tasks: list[GeneratedTask]
+    _by_order: dict[int, GeneratedTask] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._by_order = {task.order_index: task for task in self.tasks}
+
+    @property
+    def total_tasks(self) -> int:
+        return self.task_set.total_tasks
+
+    def task(self, order_index: int) -> Optional[GeneratedTask]:
+        return self._by_order.get(order_index)
+
+
+settings = load_settings()
+# tg_id -> User, filled by bot.middlewares.UserMiddleware. Only registered
+# users are cached, so create_user just has to drop a stale entry.
+user_cache: TTLCache[int, User] = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+# user_id -> ActiveTaskSet of the answer checking loop in bot.handlers.tasks
+active_set_cache: TTLCache[int, ActiveTaskSet] = TTLCache(
+    maxsize=settings.active_set_cache_size, ttl=settings.active_set_cache_ttl
+)
@@ -0,0 +1,88 @@
+"""Engine profiles: connection tuning per database backend.
+
+SQLite gets WAL journaling and the other pragmas below on every new
+connection, so readers no longer block the writer. PostgreSQL (asyncpg)
+gets a sized connection pool, pre-ping and prepared statement caching.
+Other backends use SQLAlchemy defaults. Every engine reports statement
+counts and durations to ``core.metrics``.
+"""
+from time import perf_counter
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from core.config import Settings
+from core.metrics import SQL_SECONDS
+
+
+def sqlite_pragmas(settings: Settings) -> list[str]:
+    return [
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_mb * 1024 * 1024}",
+        # negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size={-settings.sqlite_cache_mb * 1024}",
+    ]
+
+
+def engine_options(settings: Settings, url: str) -> dict[str, Any]:
+    backend = make_url(url).get_backend_name()
+    if backend == "postgresql":
+        return {
+            "pool_size": settings.pg_pool_size,
+            "max_overflow": settings.pg_max_overflow,
+            "pool_pre_ping": settings.pg_pool_pre_ping,
+            # SQLAlchemy's own cache of asyncpg prepared statements, and asyncpg's;
+            # 0 disables both (needed behind pgbouncer in transaction mode)
+            "connect_args": {
+                "prepared_statement_cache_size": settings.pg_statement_cache_size,
+                "statement_cache_size": settings.pg_statement_cache_size,
+            },
+        }
+    return {}
+
+
+def upsert_insert(dialect_name: str):
+    """``insert`` construct with ``on_conflict_do_update`` for the backend.
+
+    SQLite and PostgreSQL share the ON CONFLICT ... DO UPDATE API.
+    """
+    return postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Time each statement into ``db_statement_seconds``, labelled by its first keyword."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _started(conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is not None:
+            context._metrics_started = perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _finished(conn, cursor, statement, parameters, context, executemany) -> None:
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            SQL_SECONDS.observe(perf_counter() - started, operation=operation)
+
+
+def create_engine(settings: Settings, url: Optional[str] = None, tuned: bool = True) -> AsyncEngine:
+    """Engine for ``url`` (default ``settings.database_url``) with its backend profile."""
+    url = url or settings.database_url
+    engine = create_async_engine(url, echo=False, future=True, **(engine_options(settings, url) if tuned else {}))
+    if tuned and engine.dialect.name == "sqlite":
+        pragmas = sqlite_pragmas(settings)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record) -> None:
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    instrument_engine(engine)
+    return engine
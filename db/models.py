@@ -1,7 +1,8 @@
 import enum
-from datetime import datetime
+from datetime import date, datetime
+from typing import Optional
 
-from sqlalchemy import Boolean, DateTime, Enum, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Enum, Float, ForeignKey, Index, Integer, LargeBinary, String, Text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -22,6 +23,8 @@ class User(Base):
     full_name: Mapped[str] = mapped_column(String(255))
     grade: Mapped[str] = mapped_column(String(32))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # utils.bloom.BloomFilter of task_fingerprint() of the tasks given to the student
+    seen_tasks: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True, default=None)
 
     task_sets: Mapped[list["TaskSet"]] = relationship(back_populates="user", cascade="all, delete-orphan")
     attempts: Mapped[list["AnswerAttempt"]] = relationship(back_populates="user", cascade="all, delete-orphan")
@@ -36,6 +39,8 @@ class TaskSet(Base):
     total_tasks: Mapped[int] = mapped_column(Integer)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     is_completed: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Telegram file_id of the uploaded PDF: re-sends reuse it instead of uploading again
+    pdf_file_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True, default=None)
 
     user: Mapped[User] = relationship(back_populates="task_sets")
     tasks: Mapped[list["GeneratedTask"]] = relationship(back_populates="task_set", cascade="all, delete-orphan")
@@ -50,8 +55,15 @@ class GeneratedTask(Base):
     subject: Mapped[Subject] = mapped_column(Enum(Subject))
     topic: Mapped[str] = mapped_column(String(128))
     difficulty: Mapped[str] = mapped_column(String(16), default="normal")
-    text: Mapped[str] = mapped_column(Text)
+    # empty for tasks stored as (generator_id, generator_version, params),
+    # see db.repository.task_text
+    text: Mapped[str] = mapped_column(Text, default="")
+    generator_id: Mapped[Optional[str]] = mapped_column(String(32), nullable=True, default=None)
+    generator_version: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, default=None)
+    params: Mapped[Optional[str]] = mapped_column(String(128), nullable=True, default=None)
     correct_answer: Mapped[str] = mapped_column(String(64))
+    # tasks.checker.to_fixed(correct_answer); NULL for rows the checker has to parse
+    correct_answer_fixed: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     task_set: Mapped[TaskSet] = relationship(back_populates="tasks")
@@ -71,3 +83,68 @@ class AnswerAttempt(Base):
 
     task: Mapped[GeneratedTask] = relationship(back_populates="attempts")
     user: Mapped[User] = relationship(back_populates="attempts")
+
+
+class UserTopicStats(Base):
+    """Running per-user, per-topic counters kept in step with answer_attempts."""
+
+    __tablename__ = "user_topic_stats"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    subject: Mapped[Subject] = mapped_column(Enum(Subject), primary_key=True)
+    topic: Mapped[str] = mapped_column(String(128), primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    correct: Mapped[int] = mapped_column(Integer, default=0)
+    peeked: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class UserDailyStats(Base):
+    """Per-user daily attempt buckets; only the last week is kept."""
+
+    __tablename__ = "user_daily_stats"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    correct: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class GradeTopicDaily(Base):
+    """Attempts of a whole grade per day and topic, filled by db.rollups."""
+
+    __tablename__ = "grade_topic_daily"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    grade: Mapped[str] = mapped_column(String(32), primary_key=True)
+    subject: Mapped[Subject] = mapped_column(Enum(Subject), primary_key=True)
+    topic: Mapped[str] = mapped_column(String(128), primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    correct: Mapped[int] = mapped_column(Integer, default=0)
+    peeked: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class FsmRecord(Base):
+    """aiogram FSM state and data of one chat/user, see bot.storage."""
+
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    data: Mapped[str] = mapped_column(Text, default="{}")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+# Access paths of the hot queries in db.repository. Existing databases get
+# these through the versioned migrations in db.base.init_db.
+Index("ix_generated_tasks_set_order", GeneratedTask.task_set_id, GeneratedTask.order_index)
+# Only open sets are looked up by user; completed ones stay out of the index.
+Index(
+    "ix_task_sets_open_by_user",
+    TaskSet.user_id,
+    TaskSet.created_at,
+    sqlite_where=TaskSet.is_completed.is_(False),
+    postgresql_where=TaskSet.is_completed.is_(False),
+)
+Index("ix_answer_attempts_user_created", AnswerAttempt.user_id, AnswerAttempt.created_at)
+# Day ranges scanned by the grade rollups.
+Index("ix_answer_attempts_created", AnswerAttempt.created_at)
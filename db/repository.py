@@ -1,11 +1,15 @@
 from collections import defaultdict
-from datetime import datetime, timedelta
-from typing import Iterable, Optional
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional
 
-from sqlalchemy import func, select, update
+from sqlalchemy import func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.models import AnswerAttempt, GeneratedTask, Subject, TaskSet, User
+from db.cache import user_cache
+from db.models import AnswerAttempt, GeneratedTask, Subject, TaskSet, User, UserDailyStats, UserTopicStats
+from db.stats import AttemptFact, bump_stats, window_start
+from tasks.checker import to_fixed
+from tasks.generator import pack_params, render_task, unpack_params
 
 
 async def get_user(session: AsyncSession, tg_id: int) -> Optional[User]:
@@ -18,44 +22,112 @@ async def create_user(session: AsyncSession, tg_id: int, full_name: str, grade:
     session.add(user)
     await session.commit()
     await session.refresh(user)
+    user_cache.set(tg_id, user)
     return user
 
 
+def _build_tasks(task_set: TaskSet, subject: Subject, tasks: list[dict]) -> list[GeneratedTask]:
+    built: list[GeneratedTask] = []
+    for idx, task in enumerate(tasks, start=1):
+        task_data = {
+            "task_set_id": task_set.id,
+            "order_index": idx,
+            "subject": subject,
+            "topic": task["topic"],
+            "correct_answer": str(task["answer"]),
+            "correct_answer_fixed": to_fixed(str(task["answer"])),
+        }
+        if task.get("generator_id"):
+            # the text is rendered again from the generator when needed
+            task_data["generator_id"] = task["generator_id"]
+            task_data["generator_version"] = task["generator_version"]
+            task_data["params"] = pack_params(task["params"])
+        else:
+            task_data["text"] = task["text"]
+        if "difficulty" in task:
+            task_data["difficulty"] = task["difficulty"]
+        built.append(GeneratedTask(**task_data))
+    return built
+
+
+def task_text(task: GeneratedTask) -> str:
+    """Task text: stored, or rendered again from the generator (LRU-cached)."""
+    if task.generator_id is None:
+        return task.text
+    return render_task(task.generator_id, task.generator_version, unpack_params(task.params)).text
+
+
 async def create_task_set(
     session: AsyncSession,
     user_id: int,
     subject: Subject,
     tasks: Iterable[dict],
+    seen_tasks: Optional[bytes] = None,
 ) -> tuple[TaskSet, list[GeneratedTask]]:
+    """Create a task set; ``seen_tasks`` is the student's updated filter, saved in the same transaction."""
     tasks_list = list(tasks)
     task_set = TaskSet(user_id=user_id, subject=subject, total_tasks=len(tasks_list))
     session.add(task_set)
     await session.flush()
 
-    tasks_to_add: list[GeneratedTask] = []
-    for idx, task in enumerate(tasks_list, start=1):
-        task_data = {
-            "task_set_id": task_set.id,
-            "order_index": idx,
-            "subject": subject,
-            "topic": task["topic"],
-            "text": task["text"],
-            "correct_answer": str(task["answer"]),
-        }
-        if "difficulty" in task:
-            task_data["difficulty"] = task["difficulty"]
-        tasks_to_add.append(GeneratedTask(**task_data))
+    tasks_to_add = _build_tasks(task_set, subject, tasks_list)
     session.add_all(tasks_to_add)
+    if seen_tasks is not None:
+        await session.execute(update(User).where(User.id == user_id).values(seen_tasks=seen_tasks))
     await session.commit()
     await session.refresh(task_set)
     return task_set, tasks_to_add
 
 
+async def create_task_sets_bulk(
+    session: AsyncSession,
+    subject: Subject,
+    tasks_by_user: Iterable[tuple[int, Iterable[dict]]],
+) -> list[tuple[TaskSet, list[GeneratedTask]]]:
+    """Create one task set per user in a single transaction."""
+    pending = [(user_id, list(tasks)) for user_id, tasks in tasks_by_user]
+    task_sets = [TaskSet(user_id=user_id, subject=subject, total_tasks=len(tasks)) for user_id, tasks in pending]
+    session.add_all(task_sets)
+    await session.flush()
+
+    created: list[tuple[TaskSet, list[GeneratedTask]]] = []
+    for task_set, (_, tasks) in zip(task_sets, pending):
+        created.append((task_set, _build_tasks(task_set, subject, tasks)))
+    session.add_all([task for _, built in created for task in built])
+    await session.commit()
+    return created
+
+
+async def get_users_by_grade(session: AsyncSession, grade: str) -> list[User]:
+    result = await session.execute(select(User).where(User.grade == grade).order_by(User.full_name))
+    return list(result.scalars().all())
+
+
 async def get_task_set(session: AsyncSession, task_set_id: int) -> Optional[TaskSet]:
     result = await session.execute(select(TaskSet).where(TaskSet.id == task_set_id))
     return result.scalar_one_or_none()
 
 
+async def get_task_set_tasks(session: AsyncSession, task_set_id: int) -> list[GeneratedTask]:
+    stmt = select(GeneratedTask).where(GeneratedTask.task_set_id == task_set_id).order_by(GeneratedTask.order_index)
+    result = await session.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def get_task_set_with_tasks(
+    session: AsyncSession, task_set_id: int
+) -> Optional[tuple[TaskSet, list[GeneratedTask]]]:
+    task_set = await get_task_set(session, task_set_id)
+    if task_set is None:
+        return None
+    return task_set, await get_task_set_tasks(session, task_set_id)
+
+
+async def set_task_set_file_id(session: AsyncSession, task_set_id: int, file_id: str) -> None:
+    await session.execute(update(TaskSet).where(TaskSet.id == task_set_id).values(pdf_file_id=file_id))
+    await session.commit()
+
+
 async def get_latest_open_task_set(session: AsyncSession, user_id: int) -> Optional[TaskSet]:
     stmt = (
         select(TaskSet)
@@ -84,19 +156,71 @@ async def save_attempt(
     is_correct: bool,
     looked_answer: bool = False,
 ) -> AnswerAttempt:
+    now = datetime.utcnow()
     attempt = AnswerAttempt(
         task_id=task.id,
         user_id=user.id,
         user_answer=user_answer,
         is_correct=is_correct,
         looked_answer=looked_answer,
+        created_at=now,
     )
     session.add(attempt)
+    await bump_stats(
+        session,
+        [AttemptFact(user.id, task.subject, task.topic, is_correct, looked_answer, now.date())],
+    )
     await session.commit()
     await session.refresh(attempt)
     return attempt
 
 
+class NewAttempt(NamedTuple):
+    task: GeneratedTask
+    user_id: int
+    user_answer: str
+    is_correct: bool
+    looked_answer: bool
+    created_at: datetime
+
+
+async def save_attempts(session: AsyncSession, attempts: list[NewAttempt]) -> None:
+    """Insert many attempts in one multi-row INSERT together with their counters."""
+    if not attempts:
+        return
+    await session.execute(
+        insert(AnswerAttempt),
+        [
+            {
+                "task_id": attempt.task.id,
+                "user_id": attempt.user_id,
+                "user_answer": attempt.user_answer,
+                "is_correct": attempt.is_correct,
+                "looked_answer": attempt.looked_answer,
+                "created_at": attempt.created_at,
+            }
+            for attempt in attempts
+        ],
+    )
+    await bump_stats(
+        session,
+        [
+            AttemptFact(a.user_id, a.task.subject, a.task.topic, a.is_correct, a.looked_answer, a.created_at.date())
+            for a in attempts
+        ],
+    )
+    await session.commit()
+
+
+async def save_graded_task_set(session: AsyncSession, task_set_id: int, attempts: list[NewAttempt]) -> None:
+    """Record the attempts of a variant graded at once and close it, in one transaction."""
+    await session.execute(update(TaskSet).where(TaskSet.id == task_set_id).values(is_completed=True))
+    if attempts:
+        await save_attempts(session, attempts)
+    else:
+        await session.commit()
+
+
 async def mark_task_set_completed(session: AsyncSession, task_set_id: int) -> None:
     await session.execute(update(TaskSet).where(TaskSet.id == task_set_id).values(is_completed=True))
     await session.commit()
@@ -111,42 +235,26 @@ async def calc_stats(session: AsyncSession, user_id: int) -> dict:
         "peeked": 0,
         "last_7d": {},
     }
-    attempts_stmt = select(
-        func.count(AnswerAttempt.id),
-        func.count(func.nullif(AnswerAttempt.is_correct, False)),
-        func.count(func.nullif(AnswerAttempt.looked_answer, False)),
-    ).where(AnswerAttempt.user_id == user_id)
-    total_count, correct_count, peek_count = (await session.execute(attempts_stmt)).one()
-    stats["total_attempts"] = int(total_count or 0)
-    stats["total_correct"] = int(correct_count or 0)
-    stats["peeked"] = int(peek_count or 0)
-
-    by_subject_stmt = (
-        select(GeneratedTask.subject, func.count(AnswerAttempt.id), func.count(func.nullif(AnswerAttempt.is_correct, False)))
-        .join(GeneratedTask, GeneratedTask.id == AnswerAttempt.task_id)
-        .where(AnswerAttempt.user_id == user_id)
-        .group_by(GeneratedTask.subject)
-    )
-    for subject, total, correct in (await session.execute(by_subject_stmt)).all():
-        stats["by_subject"][subject.value] = {"total": int(total), "correct": int(correct)}
-
-    by_topic_stmt = (
-        select(GeneratedTask.topic, func.count(AnswerAttempt.id), func.count(func.nullif(AnswerAttempt.is_correct, False)))
-        .join(GeneratedTask, GeneratedTask.id == AnswerAttempt.task_id)
-        .where(AnswerAttempt.user_id == user_id)
-        .group_by(GeneratedTask.topic)
+    topics_stmt = (
+        select(UserTopicStats.subject, UserTopicStats.topic, UserTopicStats.total, UserTopicStats.correct, UserTopicStats.peeked)
+        .where(UserTopicStats.user_id == user_id)
+        .order_by(UserTopicStats.subject, UserTopicStats.topic)
     )
     topic_stats = defaultdict(lambda: {"total": 0, "correct": 0})
-    for topic, total, correct in (await session.execute(by_topic_stmt)).all():
-        topic_stats[topic]["total"] = int(total)
-        topic_stats[topic]["correct"] = int(correct)
+    for subject, topic, total, correct, peeked in (await session.execute(topics_stmt)).all():
+        stats["total_attempts"] += total
+        stats["total_correct"] += correct
+        stats["peeked"] += peeked
+        subject_stats = stats["by_subject"].setdefault(subject.value, {"total": 0, "correct": 0})
+        subject_stats["total"] += total
+        subject_stats["correct"] += correct
+        topic_stats[topic]["total"] += total
+        topic_stats[topic]["correct"] += correct
     stats["by_topic"] = topic_stats
 
-    since = datetime.utcnow() - timedelta(days=7)
-    last_stmt = select(
-        func.count(AnswerAttempt.id),
-        func.count(func.nullif(AnswerAttempt.is_correct, False)),
-    ).where(AnswerAttempt.user_id == user_id, AnswerAttempt.created_at >= since)
+    last_stmt = select(func.sum(UserDailyStats.total), func.sum(UserDailyStats.correct)).where(
+        UserDailyStats.user_id == user_id, UserDailyStats.day >= window_start()
+    )
     last_total, last_correct = (await session.execute(last_stmt)).one()
     stats["last_7d"] = {"total": int(last_total or 0), "correct": int(last_correct or 0)}
     return stats
@@ -0,0 +1,110 @@
+"""Daily (grade, subject, topic) rollups of answer attempts.
+
+Teacher reports read ``grade_topic_daily`` only, so their cost depends on
+the number of days and topics asked for, not on the size of
+answer_attempts. ``refresh_rollups`` recomputes every day from the last
+rolled-up one up to today; ``run_rollups`` repeats it in the background.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from sqlalchemy import Date, delete, func, insert, literal, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Executable
+
+from db.base import get_session
+from db.models import AnswerAttempt, GeneratedTask, GradeTopicDaily, Subject, User
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ReportRow:
+    grade: str
+    subject: Subject
+    topic: Optional[str]
+    total: int
+    correct: int
+    peeked: int
+
+
+def rollup_statements(day: date) -> list[Executable]:
+    """Statements that replace the buckets of one day."""
+    start = datetime.combine(day, time.min)
+    attempts = (
+        select(
+            literal(day, Date),
+            User.grade,
+            GeneratedTask.subject,
+            GeneratedTask.topic,
+            func.count(AnswerAttempt.id),
+            func.count(func.nullif(AnswerAttempt.is_correct, False)),
+            func.count(func.nullif(AnswerAttempt.looked_answer, False)),
+        )
+        .join(GeneratedTask, GeneratedTask.id == AnswerAttempt.task_id)
+        .join(User, User.id == AnswerAttempt.user_id)
+        .where(AnswerAttempt.created_at >= start, AnswerAttempt.created_at < start + timedelta(days=1))
+        .group_by(User.grade, GeneratedTask.subject, GeneratedTask.topic)
+    )
+    return [
+        delete(GradeTopicDaily).where(GradeTopicDaily.day == day),
+        insert(GradeTopicDaily).from_select(
+            ["day", "grade", "subject", "topic", "total", "correct", "peeked"], attempts
+        ),
+    ]
+
+
+async def refresh_rollups(session: AsyncSession, today: Optional[date] = None) -> list[date]:
+    """Roll up every day since the last rolled-up one (inclusive) and commit."""
+    today = today or datetime.utcnow().date()
+    start = (await session.execute(select(func.max(GradeTopicDaily.day)))).scalar()
+    if start is None:
+        first_attempt = (await session.execute(select(func.min(AnswerAttempt.created_at)))).scalar()
+        if first_attempt is None:
+            return []
+        start = first_attempt.date()
+    days = [start + timedelta(days=offset) for offset in range((today - start).days + 1)]
+    for day in days:
+        for stmt in rollup_statements(day):
+            await session.execute(stmt)
+    await session.commit()
+    return days
+
+
+async def run_rollups(interval: float) -> None:
+    while True:
+        try:
+            async with get_session() as session:
+                days = await refresh_rollups(session)
+            logger.debug("Grade rollups refreshed for %d days", len(days))
+        except SQLAlchemyError:
+            logger.exception("Grade rollup refresh failed")
+        await asyncio.sleep(interval)
+
+
+async def grade_report(session: AsyncSession, since: date, grade: Optional[str] = None) -> list[ReportRow]:
+    """Topic breakdown for one grade, or a per-subject summary of all grades."""
+    total = func.sum(GradeTopicDaily.total)
+    correct = func.sum(GradeTopicDaily.correct)
+    peeked = func.sum(GradeTopicDaily.peeked)
+    if grade is not None:
+        stmt = (
+            select(GradeTopicDaily.subject, GradeTopicDaily.topic, total, correct, peeked)
+            .where(GradeTopicDaily.day >= since, GradeTopicDaily.grade == grade)
+            .group_by(GradeTopicDaily.subject, GradeTopicDaily.topic)
+            .order_by(GradeTopicDaily.subject, GradeTopicDaily.topic)
+        )
+        rows = (await session.execute(stmt)).all()
+        return [ReportRow(grade, subject, topic, int(t), int(c), int(p)) for subject, topic, t, c, p in rows]
+    stmt = (
+        select(GradeTopicDaily.grade, GradeTopicDaily.subject, total, correct, peeked)
+        .where(GradeTopicDaily.day >= since)
+        .group_by(GradeTopicDaily.grade, GradeTopicDaily.subject)
+        .order_by(GradeTopicDaily.grade, GradeTopicDaily.subject)
+    )
+    rows = (await session.execute(stmt)).all()
+    return [ReportRow(row_grade, subject, None, int(t), int(c), int(p)) for row_grade, subject, t, c, p in rows]
@@ -0,0 +1,126 @@
+"""Statistics counters maintained alongside answer_attempts.
+
+``bump_stats`` runs in the transaction that stores the attempts, so
+``calc_stats`` reads one row per topic instead of aggregating the whole
+attempt history. ``rebuild_statements`` recomputes the counters from
+answer_attempts for backfilling or repair.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import Date, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Executable
+
+from db.engine import upsert_insert
+from db.models import AnswerAttempt, GeneratedTask, Subject, UserDailyStats, UserTopicStats
+
+STATS_WINDOW_DAYS = 7
+
+
+@dataclass(frozen=True)
+class AttemptFact:
+    user_id: int
+    subject: Subject
+    topic: str
+    is_correct: bool
+    looked_answer: bool
+    day: date
+
+
+def window_start(today: Optional[date] = None) -> date:
+    """First daily bucket of the rolling window (today included)."""
+    today = today or datetime.utcnow().date()
+    return today - timedelta(days=STATS_WINDOW_DAYS - 1)
+
+
+async def bump_stats(session: AsyncSession, facts: Iterable[AttemptFact]) -> None:
+    """Add attempts to the counters; the caller commits."""
+    topics: dict[tuple[int, Subject, str], list[int]] = defaultdict(lambda: [0, 0, 0])
+    days: dict[tuple[int, date], list[int]] = defaultdict(lambda: [0, 0])
+    for fact in facts:
+        topic = topics[(fact.user_id, fact.subject, fact.topic)]
+        topic[0] += 1
+        topic[1] += fact.is_correct
+        topic[2] += fact.looked_answer
+        day = days[(fact.user_id, fact.day)]
+        day[0] += 1
+        day[1] += fact.is_correct
+    if not topics:
+        return
+
+    upsert = upsert_insert(session.bind.dialect.name)
+    stmt = upsert(UserTopicStats).values(
+        [
+            {"user_id": user_id, "subject": subject, "topic": topic, "total": total, "correct": correct, "peeked": peeked}
+            for (user_id, subject, topic), (total, correct, peeked) in topics.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserTopicStats.user_id, UserTopicStats.subject, UserTopicStats.topic],
+        set_={
+            "total": UserTopicStats.total + stmt.excluded.total,
+            "correct": UserTopicStats.correct + stmt.excluded.correct,
+            "peeked": UserTopicStats.peeked + stmt.excluded.peeked,
+        },
+    )
+    await session.execute(stmt)
+
+    stmt = upsert(UserDailyStats).values(
+        [
+            {"user_id": user_id, "day": day, "total": total, "correct": correct}
+            for (user_id, day), (total, correct) in days.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserDailyStats.user_id, UserDailyStats.day],
+        set_={
+            "total": UserDailyStats.total + stmt.excluded.total,
+            "correct": UserDailyStats.correct + stmt.excluded.correct,
+        },
+    )
+    await session.execute(stmt)
+
+    # Buckets that left the window are dropped by their owner's next attempt.
+    oldest = window_start(max(day for _, day in days))
+    user_ids = {user_id for user_id, _ in days}
+    await session.execute(
+        delete(UserDailyStats).where(UserDailyStats.user_id.in_(user_ids), UserDailyStats.day < oldest)
+    )
+
+
+def rebuild_statements(today: Optional[date] = None) -> list[Executable]:
+    """Statements that recompute all counters from answer_attempts."""
+    day = func.date(AnswerAttempt.created_at, type_=Date)
+    correct = func.count(func.nullif(AnswerAttempt.is_correct, False))
+    topics = (
+        select(
+            AnswerAttempt.user_id,
+            GeneratedTask.subject,
+            GeneratedTask.topic,
+            func.count(AnswerAttempt.id),
+            correct,
+            func.count(func.nullif(AnswerAttempt.looked_answer, False)),
+        )
+        .join(GeneratedTask, GeneratedTask.id == AnswerAttempt.task_id)
+        .group_by(AnswerAttempt.user_id, GeneratedTask.subject, GeneratedTask.topic)
+    )
+    days = (
+        select(AnswerAttempt.user_id, day, func.count(AnswerAttempt.id), correct)
+        .where(AnswerAttempt.created_at >= datetime.combine(window_start(today), time.min))
+        .group_by(AnswerAttempt.user_id, day)
+    )
+    return [
+        delete(UserTopicStats),
+        delete(UserDailyStats),
+        insert(UserTopicStats).from_select(["user_id", "subject", "topic", "total", "correct", "peeked"], topics),
+        insert(UserDailyStats).from_select(["user_id", "day", "total", "correct"], days),
+    ]
+
+
+async def rebuild_stats(session: AsyncSession) -> None:
+    for stmt in rebuild_statements():
+        await session.execute(stmt)
+    await session.commit()
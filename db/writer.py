@@ -0,0 +1,153 @@
+"""Write-behind batching of answer attempts.
+
+With ``ATTEMPT_WRITE_BEHIND`` enabled the checking loop only queues its
+attempts; one background task writes them with a multi-row INSERT every
+``flush_interval`` seconds, or as soon as ``batch_size`` rows are waiting,
+so a burst of answers costs one commit instead of one per message.
+Statistics readers call ``sync_attempts`` first to see their own writes,
+and ``close`` flushes whatever is left on shutdown.
+
+A batch that fails ``max_retries`` times in a row is written again row by
+row, and rows that fail on their own are logged and dropped, so one bad row
+cannot block the queue. The queue holds at most ``max_pending`` rows; when it
+is full ``submit`` refuses and the caller writes the attempt directly.
+"""
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.exc import OperationalError
+
+from core.config import load_settings
+from core.metrics import QUEUE_DEPTH
+from db.base import get_session
+from db.models import GeneratedTask
+from db.repository import NewAttempt, save_attempts
+
+logger = logging.getLogger(__name__)
+
+
+class AttemptWriter:
+    def __init__(self, flush_interval: float, batch_size: int, max_pending: int = 10000, max_retries: int = 3) -> None:
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self._pending: list[NewAttempt] = []
+        self._failures = 0  # failed batch writes in a row
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def submit(
+        self, task: GeneratedTask, user_id: int, user_answer: str, is_correct: bool, looked_answer: bool = False
+    ) -> bool:
+        """Queue an attempt; False if the queue is full and the caller must write it itself."""
+        if len(self._pending) >= self.max_pending:
+            return False
+        self._pending.append(NewAttempt(task, user_id, user_answer, is_correct, looked_answer, datetime.utcnow()))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> int:
+        """Write all queued attempts in one transaction; returns their number."""
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            if self._failures >= self.max_retries:
+                return await self._write_row_by_row(batch)
+            try:
+                async with get_session() as session:
+                    await save_attempts(session, batch)
+            except BaseException:
+                # keep the rows for the next flush, including the one in close()
+                self._pending[:0] = batch
+                self._failures += 1
+                raise
+            self._failures = 0
+            return len(batch)
+
+    async def _write_row_by_row(self, batch: list[NewAttempt]) -> int:
+        written = 0
+        for index, attempt in enumerate(batch):
+            try:
+                async with get_session() as session:
+                    await save_attempts(session, [attempt])
+            except OperationalError:
+                # the database itself is unavailable: no row is to blame
+                self._pending[:0] = batch[index:]
+                raise
+            except Exception:
+                logger.exception(
+                    "Dropping attempt of user %d on task %d that cannot be written", attempt.user_id, attempt.task.id
+                )
+            except BaseException:
+                self._pending[:0] = batch[index:]
+                raise
+            else:
+                written += 1
+        self._failures = 0
+        return written
+
+    async def sync(self, user_id: int) -> None:
+        """Make the user's queued attempts visible to database reads.
+
+        A failed flush is only logged: the reader then sees the stored rows.
+        """
+        if self._lock.locked() or any(attempt.user_id == user_id for attempt in self._pending):
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Attempt flush before a read failed, %d rows still queued", len(self._pending))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        written = await self.flush()
+        if written:
+            logger.info("Flushed %d queued attempts on shutdown", written)
+
+    async def _run(self) -> None:
+        while True:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # any failure, not only a database one: a dead loop would leave
+                # the queue unwritten until close()
+                logger.exception("Attempt flush failed, %d rows kept for retry", len(self._pending))
+
+
+settings = load_settings()
+attempt_writer: Optional[AttemptWriter] = (
+    AttemptWriter(
+        flush_interval=settings.attempt_flush_ms / 1000,
+        batch_size=settings.attempt_batch_size,
+        max_pending=settings.attempt_max_pending,
+    )
+    if settings.attempt_write_behind
+    else None
+)
+if attempt_writer is not None:
+    QUEUE_DEPTH.track(lambda: len(attempt_writer), queue="attempt_writer")
+
+
+async def sync_attempts(user_id: int) -> None:
+    if attempt_writer is not None:
+        await attempt_writer.sync(user_id)
@@ -1,13 +1,39 @@
 import asyncio
+import logging
+from typing import Optional
 
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
 
+from bot.handlers import report as report_handlers
 from bot.handlers import start as start_handlers
 from bot.handlers import stats as stats_handlers
 from bot.handlers import tasks as task_handlers
+from bot.middlewares import MetricsMiddleware, UserMiddleware
+from bot.storage import SQLAlchemyStorage, build_fsm_storage
+from bot.webhook import run_webhook
 from core.config import load_settings
 from core.logging import setup_logging
-from db.base import init_db
+from core.metrics import registry, start_metrics_server
+from db.base import AsyncSessionFactory, init_db
+from db.rollups import run_rollups
+from db.writer import attempt_writer
+from pdf.service import pdf_renderer, pdf_retention
+
+logger = logging.getLogger("main")
+
+
+def build_dispatcher(storage: Optional[BaseStorage] = None) -> Dispatcher:
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(UserMiddleware())
+    # inner middlewares of the dispatcher also wrap the handlers of included routers
+    dp.message.middleware(MetricsMiddleware())
+    dp.callback_query.middleware(MetricsMiddleware())
+    dp.include_router(start_handlers.router)
+    dp.include_router(task_handlers.router)
+    dp.include_router(stats_handlers.router)
+    dp.include_router(report_handlers.router)
+    return dp
 
 
 async def main() -> None:
@@ -16,12 +42,37 @@ async def main() -> None:
     await init_db()
 
     bot = Bot(settings.bot_token)
-    dp = Dispatcher()
-    dp.include_router(start_handlers.router)
-    dp.include_router(task_handlers.router)
-    dp.include_router(stats_handlers.router)
+    storage = build_fsm_storage(settings, AsyncSessionFactory)
+    dp = build_dispatcher(storage)
 
-    await dp.start_polling(bot)
+    retention_task = asyncio.create_task(pdf_retention.run())
+    rollup_task = asyncio.create_task(run_rollups(settings.rollup_interval))
+    if attempt_writer is not None:
+        attempt_writer.start()
+    background = [retention_task, rollup_task]
+    if isinstance(storage, SQLAlchemyStorage):
+        background.append(asyncio.create_task(storage.run_purge()))
+        registry.on_collect(storage.update_metrics)
+    metrics_runner = None
+    if settings.metrics_port:
+        try:
+            metrics_runner = await start_metrics_server(settings.metrics_host, settings.metrics_port)
+        except OSError as exc:
+            # e.g. a second bot process on the same host with the same port
+            logger.warning("Metrics server not started on %s:%d: %s", settings.metrics_host, settings.metrics_port, exc)
+    try:
+        if settings.bot_mode == "webhook":
+            await run_webhook(dp, bot, settings)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        for task in background:
+            task.cancel()
+        if attempt_writer is not None:
+            await attempt_writer.close()
+        pdf_renderer.shutdown()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 
 if __name__ == "__main__":
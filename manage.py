@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import logging
+import re
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+from aiogram import Bot
+from aiogram.types import BufferedInputFile
+
+from core.config import load_settings
+from core.logging import setup_logging
+from db.base import get_session, init_db
+from db.models import Subject
+from db.repository import create_task_sets_bulk, get_users_by_grade
+from db.rollups import refresh_rollups
+from db.stats import rebuild_stats
+from pdf.service import PdfRenderService
+from tasks.generator import generate_tasks_batch
+
+logger = logging.getLogger("manage")
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", value).strip("_") or "student"
+
+
+async def bulk_variants(args: argparse.Namespace) -> None:
+    """Generate an individual variant for every student of a grade.
+
+    All task sets are written in one transaction; the PDFs are rendered in
+    parallel (ZIP) or as one merged document (PDF).
+    """
+    if not 1 <= args.count <= 15:
+        raise SystemExit("--count must be between 1 and 15")
+    settings = load_settings()
+    await init_db()
+    subject = Subject(args.subject)
+    async with get_session() as session:
+        users = await get_users_by_grade(session, args.grade)
+        if not users:
+            raise SystemExit(f"No students registered in grade {args.grade!r}")
+        generated = generate_tasks_batch(subject, args.count * len(users), difficulty=args.difficulty, seed=args.seed)
+        tasks_by_user = []
+        for idx, user in enumerate(users):
+            chunk = generated[idx * args.count : (idx + 1) * args.count]
+            tasks_by_user.append(
+                (
+                    user.id,
+                    [
+                        {
+                            "topic": t.topic,
+                            "answer": t.answer,
+                            "difficulty": t.difficulty,
+                            "generator_id": t.generator_id,
+                            "generator_version": t.generator_version,
+                            "params": t.params,
+                        }
+                        for t in chunk
+                    ],
+                )
+            )
+        created = await create_task_sets_bulk(session, subject=subject, tasks_by_user=tasks_by_user)
+    logger.info("Created %d task sets for grade %s", len(created), args.grade)
+
+    renderer = PdfRenderService(
+        workers=settings.pdf_workers,
+        timeout=settings.pdf_render_timeout,
+        max_tasks_per_worker=0,
+        bot_name=settings.bot_name or None,
+    )
+    variants = [(task_set, tasks, user) for (task_set, tasks), user in zip(created, users)]
+    try:
+        if args.format == "pdf":
+            payload = await renderer.render_bundle(variants)
+        else:
+            rendered = await asyncio.gather(*(renderer.render(*variant) for variant in variants))
+            buffer = BytesIO()
+            with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+                for (task_set, _, user), data in zip(variants, rendered):
+                    archive.writestr(f"{_safe_name(user.full_name)}_{task_set.id}.pdf", data)
+            payload = buffer.getvalue()
+    finally:
+        renderer.shutdown()
+
+    filename = f"{_safe_name(args.grade)}_{subject.value}.{args.format}"
+    out = Path(args.out) if args.out else Path.cwd() / filename
+    out.write_bytes(payload)
+    logger.info("Wrote %s (%d bytes)", out, len(payload))
+    if args.chat_id:
+        async with Bot(settings.bot_token) as bot:
+            await bot.send_document(
+                args.chat_id,
+                BufferedInputFile(payload, filename=filename),
+                caption=f"Варианты для {args.grade}: {len(variants)} учеников, предмет {subject.value}.",
+            )
+
+
+async def rebuild_stats_command(args: argparse.Namespace) -> None:
+    """Recompute the statistics counters from answer_attempts."""
+    await init_db()
+    async with get_session() as session:
+        await rebuild_stats(session)
+    logger.info("Statistics counters rebuilt")
+
+
+async def rollup_command(args: argparse.Namespace) -> None:
+    """Bring the daily grade rollups up to date (first run backfills history)."""
+    await init_db()
+    async with get_session() as session:
+        days = await refresh_rollups(session)
+    logger.info("Grade rollups refreshed for %d days", len(days))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Служебные команды бота")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bulk = commands.add_parser("bulk-variants", help="варианты для всего класса")
+    bulk.add_argument("--grade", required=True, help="класс, например 9Б")
+    bulk.add_argument("--subject", choices=[s.value for s in Subject], required=True)
+    bulk.add_argument("--count", type=int, default=10, help="задач в варианте (1-15)")
+    bulk.add_argument("--difficulty", choices=["easy", "normal", "hard"], default="normal")
+    bulk.add_argument("--format", choices=["zip", "pdf"], default="zip", help="ZIP из отдельных PDF или один общий PDF")
+    bulk.add_argument("--seed", type=int, default=None)
+    bulk.add_argument("--out", help="куда записать результат")
+    bulk.add_argument("--chat-id", type=int, help="отправить результат в этот чат Telegram")
+    bulk.set_defaults(handler=bulk_variants)
+
+    rebuild = commands.add_parser("rebuild-stats", help="пересчитать счётчики статистики по попыткам")
+    rebuild.set_defaults(handler=rebuild_stats_command)
+
+    rollup = commands.add_parser("rollup", help="обновить дневные сводки по классам")
+    rollup.set_defaults(handler=rollup_command)
+    return parser
+
+
+def main() -> None:
+    setup_logging()
+    args = build_parser().parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
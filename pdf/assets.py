@@ -0,0 +1,86 @@
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+import qrcode
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+_FONT_NAME = "CyrillicSans"
+_FONT_CANDIDATES = [
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "/System/Library/Fonts/Supplemental/Arial Unicode.ttf",
+    "/System/Library/Fonts/Supplemental/Times New Roman.ttf",
+    "/Library/Fonts/Arial.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "/Library/Fonts/Times New Roman.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+]
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 20 * mm
+
+# Page furniture that is identical in every file, in page coordinates. The
+# three student lines are drawn per file between the title and the hint.
+TITLE_Y = PAGE_HEIGHT - MARGIN
+HINT_Y = TITLE_Y - 56
+BODY_TOP_Y = HINT_Y - 18
+HINT_TEXT = "Ответ: десятичная дробь или целое. Округляйте до тысячных при необходимости."
+
+_FURNITURE_FORM = "static_furniture"
+
+
+@lru_cache(maxsize=1)
+def font_name() -> str:
+    """Register the Cyrillic font once per process and return its name."""
+    for path in _FONT_CANDIDATES:
+        if Path(path).exists():
+            pdfmetrics.registerFont(TTFont(_FONT_NAME, path))
+            return _FONT_NAME
+    # fallback to built-in (может не отрендерить кириллицу, но не падаем)
+    return "Helvetica"
+
+
+@lru_cache(maxsize=8)
+def qr_image(bot_name: str) -> ImageReader:
+    """QR code with the bot link, encoded to PNG once per bot name."""
+    qr = qrcode.QRCode(border=1, box_size=4)
+    qr.add_data(f"https://t.me/{bot_name}")
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
+    stream = BytesIO()
+    img.save(stream, format="PNG")
+    stream.seek(0)
+    return ImageReader(stream)
+
+
+def warm_up(bot_name: Optional[str] = None) -> None:
+    """Load fonts and the QR image up front (used as a render worker initializer)."""
+    font_name()
+    if bot_name:
+        qr_image(bot_name)
+
+
+def stamp_static_furniture(c: canvas.Canvas, bot_name: Optional[str] = None) -> None:
+    """Draw the title, the answer hint and the QR code as one reusable form XObject."""
+    if not c.hasForm(_FURNITURE_FORM):
+        font = font_name()
+        c.beginForm(_FURNITURE_FORM)
+        c.setFillColor(colors.black)
+        c.setFont(font, 14)
+        c.drawString(MARGIN, TITLE_Y, "Индивидуальные задания")
+        c.setFont(font, 10)
+        c.setFillColor(colors.gray)
+        c.drawString(MARGIN, HINT_Y, HINT_TEXT)
+        if bot_name:
+            c.drawImage(qr_image(bot_name), PAGE_WIDTH - MARGIN - 30 * mm, PAGE_HEIGHT - 38 * mm, 25 * mm, 25 * mm)
+        c.endForm()
+    c.doForm(_FURNITURE_FORM)
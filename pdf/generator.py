@@ -2,107 +2,110 @@ from io import BytesIO
 from pathlib import Path
 from typing import Iterable, Optional
 
-import qrcode
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 
 from db.models import GeneratedTask, TaskSet, User
+from pdf.assets import BODY_TOP_Y, MARGIN, PAGE_HEIGHT, PAGE_WIDTH, TITLE_Y, font_name, stamp_static_furniture
+from pdf.layout import pack_blocks, wrap_text
 
+_FONT_SIZE = 11
+_LEADING = 13
+_BLOCK_GAP = 8
+_GUTTER = 8 * mm
 
-_FONT_NAME = "CyrillicSans"
 
-
-def _register_font() -> str:
-    candidates = [
-        "/System/Library/Fonts/Supplemental/Arial.ttf",
-        "/System/Library/Fonts/Supplemental/Arial Unicode.ttf",
-        "/System/Library/Fonts/Supplemental/Times New Roman.ttf",
-        "/Library/Fonts/Arial.ttf",
-        "/Library/Fonts/Arial Unicode.ttf",
-        "/Library/Fonts/Times New Roman.ttf",
-    ]
-    for path in candidates:
-        if Path(path).exists():
-            pdfmetrics.registerFont(TTFont(_FONT_NAME, path))
-            return _FONT_NAME
-    # fallback to built-in (может не отрендерить кириллицу, но не падаем)
-    return "Helvetica"
+def pdf_filename(task_set_id: int) -> str:
+    return f"taskset_{task_set_id}.pdf"
 
 
 def build_pdf(task_set: TaskSet, tasks: Iterable[GeneratedTask], user: User, pdf_dir: Path, bot_name: Optional[str] = None) -> Path:
-    font_name = _register_font()
     pdf_dir.mkdir(parents=True, exist_ok=True)
-    filename = pdf_dir / f"taskset_{task_set.id}.pdf"
-    c = canvas.Canvas(str(filename), pagesize=A4)
-    width, height = A4
+    filename = pdf_dir / pdf_filename(task_set.id)
+    filename.write_bytes(render_pdf(task_set, tasks, user, bot_name=bot_name))
+    return filename
 
-    margin = 20 * mm
-    y = height - margin
 
-    # Header without heavy bar
-    c.setFillColor(colors.black)
-    c.setFont(font_name, 14)
-    c.drawString(margin, y, "Индивидуальные задания")
-    y -= 16
+def render_pdf(
+    task_set: TaskSet,
+    tasks: Iterable[GeneratedTask],
+    user: User,
+    bot_name: Optional[str] = None,
+    columns: int = 2,
+) -> bytes:
+    """Render the variant into memory and return the PDF bytes.
+
+    Tasks are packed into ``columns`` columns; a task is never split across
+    columns or pages.
+    """
+    return render_pdf_bundle([(task_set, tasks, user)], bot_name=bot_name, columns=columns)
+
+
+def render_pdf_bundle(
+    variants: Iterable[tuple[TaskSet, Iterable[GeneratedTask], User]],
+    bot_name: Optional[str] = None,
+    columns: int = 2,
+) -> bytes:
+    """Render several variants into one document, each starting on a new page.
+
+    The font subset and the page furniture form are embedded once for the
+    whole bundle.
+    """
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    for task_set, tasks, user in variants:
+        _draw_variant(c, task_set, tasks, user, bot_name, columns)
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
 
-    c.setFont(font_name, 11)
-    c.drawString(margin, y, f"Ученик: {user.full_name} (класс: {user.grade})")
-    y -= 12
-    c.drawString(margin, y, f"Предмет: {task_set.subject.value}")
-    y -= 12
-    c.drawString(margin, y, f"Набор № {task_set.id}, задач: {task_set.total_tasks}")
-    y -= 16
-    c.setFont(font_name, 10)
-    c.setFillColor(colors.gray)
-    c.drawString(margin, y, "Ответ: десятичная дробь или целое. Округляйте до тысячных при необходимости.")
-    y -= 18
-    c.setFillColor(colors.black)
 
-    if bot_name:
-        qr_stream = BytesIO()
-        qr = qrcode.QRCode(border=1, box_size=4)
-        qr.add_data(f"https://t.me/{bot_name}")
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
-        img.save(qr_stream, format="PNG")
-        qr_stream.seek(0)
-        c.drawInlineImage(img, width - margin - 30 * mm, height - 38 * mm, 25 * mm, 25 * mm)
-
-    for task in tasks:
-        text = f"{task.order_index}. {task.text}"
-        # Wrap manually if line is too long
-        wrapped = _wrap_text(text, max_width=width - 2 * margin, font_size=11)
-        for line in wrapped:
-            if y < margin:
-                c.showPage()
-                y = height - margin
-                c.setFont(font_name, 11)
-            c.drawString(margin, y, line)
-            y -= 12
-        y -= 6
-
-    c.showPage()
-    c.save()
-    return filename
+def _draw_variant(
+    c: canvas.Canvas,
+    task_set: TaskSet,
+    tasks: Iterable[GeneratedTask],
+    user: User,
+    bot_name: Optional[str],
+    columns: int,
+) -> None:
+    font = font_name()
 
+    # Title, hint line and QR are shared by every file, only the student block differs
+    stamp_static_furniture(c, bot_name)
+    c.setFillColor(colors.black)
+    c.setFont(font, _FONT_SIZE)
+    y = TITLE_Y - 16
+    c.drawString(MARGIN, y, f"Ученик: {user.full_name} (класс: {user.grade})")
+    y -= 12
+    c.drawString(MARGIN, y, f"Предмет: {task_set.subject.value}")
+    y -= 12
+    c.drawString(MARGIN, y, f"Набор № {task_set.id}, задач: {task_set.total_tasks}")
 
-def _wrap_text(text: str, max_width: float, font_size: int) -> list[str]:
-    # Simple word-wrapping based on character count approximation
-    avg_char_width = font_size * 0.5
-    max_chars = int(max_width / avg_char_width)
-    words = text.split()
-    lines = []
-    current = ""
-    for word in words:
-        if len(current) + len(word) + 1 > max_chars:
-            lines.append(current.strip())
-            current = word
-        else:
-            current += " " + word
-    if current:
-        lines.append(current.strip())
-    return lines
+    column_width = (PAGE_WIDTH - 2 * MARGIN - (columns - 1) * _GUTTER) / columns
+    blocks = [
+        wrap_text(f"{task.order_index}. {task.text}", column_width, font, _FONT_SIZE)
+        for task in tasks
+    ]
+    placed = pack_blocks(
+        blocks,
+        columns=columns,
+        left=MARGIN,
+        column_width=column_width,
+        gutter=_GUTTER,
+        first_page_top=BODY_TOP_Y,
+        page_top=PAGE_HEIGHT - MARGIN,
+        bottom=MARGIN,
+        leading=_LEADING,
+        block_gap=_BLOCK_GAP,
+    )
+    page = 0
+    for block in placed:
+        if block.page != page:
+            c.showPage()
+            page = block.page
+        text = c.beginText(block.x, block.y)
+        text.setFont(font, _FONT_SIZE, _LEADING)
+        text.textLines(block.lines)
+        c.drawText(text)
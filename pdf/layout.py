@@ -0,0 +1,113 @@
+"""Text measurement and task placement for the variant PDF.
+
+Widths come from the real glyph metrics (``pdfmetrics.stringWidth``) and are
+memoized per font in a character width table, so wrapping a line costs a few
+dict lookups instead of a metrics call per word.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+
+from reportlab.pdfbase import pdfmetrics
+
+
+class _WidthTable(dict):
+    """Character widths of one font at size 1; filled lazily."""
+
+    def __init__(self, font_name: str) -> None:
+        super().__init__()
+        self.font_name = font_name
+
+    def __missing__(self, char: str) -> float:
+        width = pdfmetrics.stringWidth(char, self.font_name, 1000) / 1000
+        self[char] = width
+        return width
+
+
+@lru_cache(maxsize=16)
+def _width_table(font_name: str) -> _WidthTable:
+    return _WidthTable(font_name)
+
+
+def string_width(text: str, font_name: str, font_size: float) -> float:
+    table = _width_table(font_name)
+    return sum(table[char] for char in text) * font_size
+
+
+def wrap_text(text: str, max_width: float, font_name: str, font_size: float) -> list[str]:
+    """Greedy word wrap by measured width; words longer than a line are split."""
+    table = _width_table(font_name)
+    limit = max_width / font_size
+    space = table[" "]
+    lines: list[str] = []
+    current: list[str] = []
+    current_width = 0.0
+    for word in text.split():
+        word_width = sum(table[char] for char in word)
+        while word_width > limit:
+            # a single over-long token (formula, long number): cut it by characters
+            if current:
+                lines.append(" ".join(current))
+                current, current_width = [], 0.0
+            cut, cut_width = 0, 0.0
+            while cut < len(word) and cut_width + table[word[cut]] <= limit:
+                cut_width += table[word[cut]]
+                cut += 1
+            cut = max(cut, 1)
+            lines.append(word[:cut])
+            word = word[cut:]
+            word_width = sum(table[char] for char in word)
+        if not word:
+            continue
+        extra = word_width + (space if current else 0.0)
+        if current and current_width + extra > limit:
+            lines.append(" ".join(current))
+            current, current_width = [word], word_width
+        else:
+            current.append(word)
+            current_width += extra
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+
+@dataclass
+class PlacedBlock:
+    page: int
+    x: float
+    y: float
+    lines: list[str]
+
+
+def pack_blocks(
+    blocks: list[list[str]],
+    *,
+    columns: int,
+    left: float,
+    column_width: float,
+    gutter: float,
+    first_page_top: float,
+    page_top: float,
+    bottom: float,
+    leading: float,
+    block_gap: float,
+) -> list[PlacedBlock]:
+    """Place wrapped task blocks column by column, page by page.
+
+    A block is never split: if it does not fit into what is left of the
+    column it moves to the next column (or page). Only a block taller than a
+    whole column is allowed to start at the top of one anyway.
+    """
+    placed: list[PlacedBlock] = []
+    page, column, top = 0, 0, first_page_top
+    y = top
+    for lines in blocks:
+        height = len(lines) * leading
+        if y - height < bottom and y < top:
+            column += 1
+            if column >= columns:
+                page, column, top = page + 1, 0, page_top
+            y = top
+        x = left + column * (column_width + gutter)
+        placed.append(PlacedBlock(page=page, x=x, y=y, lines=lines))
+        y -= height + block_gap
+    return placed
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from pdf.generator import pdf_filename
+
+logger = logging.getLogger(__name__)
+
+
+class PdfRetentionManager:
+    """Keeps the PDF archive directory under a size and age limit.
+
+    The file modification time doubles as the last-access time: ``load``
+    touches a file every time it is served (``atime`` is usually disabled on
+    our volumes). ``sweep`` first drops files older than ``max_age`` seconds,
+    then evicts the least recently used ones until the directory fits into
+    ``max_bytes``. Evicted variants are rendered again from the database on
+    the next request.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, max_age: float, interval: float) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.interval = interval
+
+    def path_for(self, task_set_id: int) -> Path:
+        return self.directory / pdf_filename(task_set_id)
+
+    def load(self, task_set_id: int) -> Optional[bytes]:
+        path = self.path_for(task_set_id)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def sweep(self, now: Optional[float] = None) -> list[Path]:
+        now = time.time() if now is None else now
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".pdf") or not entry.is_file():
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+        files.sort()
+
+        removed: list[Path] = []
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            expired = self.max_age and now - mtime > self.max_age
+            oversized = self.max_bytes and total > self.max_bytes
+            if not (expired or oversized):
+                # files are sorted by last access, everything after is newer
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed.append(path)
+        if removed:
+            logger.info("PDF retention removed %d files, %d bytes left", len(removed), total)
+        return removed
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except OSError:
+                logger.exception("PDF retention sweep failed")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Iterable, Optional
+from weakref import WeakKeyDictionary
+
+from core.config import load_settings
+from core.metrics import PDF_RENDER_SECONDS
+from db.models import GeneratedTask, Subject, TaskSet, User
+from db.repository import task_text
+from pdf.assets import warm_up
+from pdf.generator import pdf_filename, render_pdf, render_pdf_bundle
+from pdf.retention import PdfRetentionManager
+
+logger = logging.getLogger(__name__)
+
+
+class PdfRenderError(RuntimeError):
+    pass
+
+
+# Plain snapshots of the ORM objects: they are cheap to pickle and carry no
+# session state into the worker processes.
+@dataclass
+class _TaskSetSnapshot:
+    id: int
+    subject: Subject
+    total_tasks: int
+
+
+@dataclass
+class _TaskSnapshot:
+    order_index: int
+    text: str
+
+
+@dataclass
+class _UserSnapshot:
+    full_name: str
+    grade: str
+
+
+_Variant = tuple[_TaskSetSnapshot, list[_TaskSnapshot], _UserSnapshot]
+
+
+def _snapshot(task_set: TaskSet, tasks: Iterable[GeneratedTask], user: User) -> _Variant:
+    return (
+        _TaskSetSnapshot(id=task_set.id, subject=task_set.subject, total_tasks=task_set.total_tasks),
+        [_TaskSnapshot(order_index=t.order_index, text=task_text(t)) for t in tasks],
+        _UserSnapshot(full_name=user.full_name, grade=user.grade),
+    )
+
+
+def _render(
+    task_set: _TaskSetSnapshot,
+    tasks: list[_TaskSnapshot],
+    user: _UserSnapshot,
+    bot_name: Optional[str],
+    archive_dir: Optional[Path],
+) -> bytes:
+    data = render_pdf(task_set, tasks, user, bot_name=bot_name)
+    if archive_dir is not None:
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        (archive_dir / pdf_filename(task_set.id)).write_bytes(data)
+    return data
+
+
+def _render_bundle(variants: list[_Variant], bot_name: Optional[str]) -> bytes:
+    return render_pdf_bundle(variants, bot_name=bot_name)
+
+
+def _terminate(pool: ProcessPoolExecutor) -> None:
+    # A hung render would keep its worker busy forever: kill the processes
+    # explicitly, ``shutdown(wait=False)`` alone does not stop them.
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class PdfRenderService:
+    """Renders variant PDFs in a process pool so renders never block the event loop.
+
+    ``render`` returns the PDF bytes; with ``archive_dir`` set the worker also
+    keeps a copy on disk.
+
+    The pool is replaced after ``max_tasks_per_worker`` renders per worker
+    (in-flight renders of the old pool still finish). A render that exceeds
+    ``timeout`` seconds or crashes its worker retires the pool: the next call
+    starts a fresh one, the other renders still running on the old pool may
+    finish (each within its own timeout), and then the old processes are
+    killed. Until then the host briefly runs both pools. A crash fails every
+    render of its pool anyway, so there is nothing to wait for.
+
+    At most ``workers`` renders are handed to the pool at a time, so the
+    timeout measures rendering, not queueing. ``workers=0`` renders in a
+    thread of the default executor instead (handy for tests and tiny
+    deployments).
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        timeout: float,
+        max_tasks_per_worker: int,
+        bot_name: Optional[str] = None,
+        archive_dir: Optional[Path] = None,
+    ) -> None:
+        self.workers = workers
+        self.timeout = timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.bot_name = bot_name
+        self.archive_dir = archive_dir
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._submitted = 0
+        self._slots = asyncio.Semaphore(max(workers, 1))
+        # renders in flight per pool, to let them finish when the pool is retired
+        self._running: WeakKeyDictionary[ProcessPoolExecutor, set[asyncio.Future]] = WeakKeyDictionary()
+        self._retiring: set[asyncio.Task] = set()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Recycling is done pool-wide rather than with ``max_tasks_per_child``,
+        # which deadlocks on some CPython 3.12 releases when a worker exits.
+        if self._pool is not None and self.max_tasks_per_worker:
+            if self._submitted >= self.max_tasks_per_worker * self.workers:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+        if self._pool is None:
+            # forkserver: the bot process runs the aiosqlite threads, forking it
+            # directly could copy a held lock into the worker.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context("forkserver"),
+                initializer=warm_up,
+                initargs=(self.bot_name,),
+            )
+            self._submitted = 0
+        self._submitted += 1
+        return self._pool
+
+    def _recycle(self, pool: Optional[ProcessPoolExecutor]) -> None:
+        # Only the pool the failed render ran on: by the time a render on an
+        # old pool fails, another call may already have started a fresh one.
+        if pool is None or self._pool is not pool:
+            return
+        self._pool = None
+        running = {future for future in self._running.get(pool, ()) if not future.done()}
+        if not running:
+            _terminate(pool)
+            return
+        task = asyncio.create_task(self._retire(pool, running))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    @staticmethod
+    async def _retire(pool: ProcessPoolExecutor, running: set[asyncio.Future]) -> None:
+        try:
+            await asyncio.wait(running)
+        finally:
+            _terminate(pool)
+
+    async def _run(self, kind: str, label: str, timeout: float, fn, *args):
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            executor = self._get_pool() if self.workers > 0 else None
+            future = loop.run_in_executor(executor, fn, *args)
+            if executor is not None:
+                running = self._running.setdefault(executor, set())
+                running.add(future)
+                future.add_done_callback(running.discard)
+            try:
+                with PDF_RENDER_SECONDS.time(kind=kind):
+                    return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError as exc:
+                logger.warning("PDF render of %s timed out after %.1fs", label, timeout)
+                self._recycle(executor)
+                raise PdfRenderError(f"render timed out for {label}") from exc
+            except BrokenProcessPool as exc:
+                logger.exception("PDF render worker crashed, recycling the pool")
+                self._recycle(executor)
+                raise PdfRenderError(f"render worker crashed for {label}") from exc
+
+    async def render(
+        self,
+        task_set: TaskSet,
+        tasks: Iterable[GeneratedTask],
+        user: User,
+    ) -> bytes:
+        variant = _snapshot(task_set, tasks, user)
+        return await self._run(
+            "variant",
+            f"task set {task_set.id}",
+            self.timeout,
+            _render,
+            *variant,
+            self.bot_name,
+            self.archive_dir,
+        )
+
+    async def render_bundle(self, variants: Iterable[tuple[TaskSet, Iterable[GeneratedTask], User]]) -> bytes:
+        """Render several variants into one merged PDF in a single worker."""
+        snapshots = [_snapshot(*variant) for variant in variants]
+        timeout = self.timeout * max(len(snapshots), 1)
+        label = f"bundle of {len(snapshots)} variants"
+        return await self._run("bundle", label, timeout, _render_bundle, snapshots, self.bot_name)
+
+    def shutdown(self) -> None:
+        for task in self._retiring:
+            task.cancel()  # its pool is killed on the way out
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+settings = load_settings()
+pdf_renderer = PdfRenderService(
+    workers=settings.pdf_workers,
+    timeout=settings.pdf_render_timeout,
+    max_tasks_per_worker=settings.pdf_worker_max_tasks,
+    bot_name=settings.bot_name or None,
+    archive_dir=settings.pdf_dir if settings.pdf_archive else None,
+)
+pdf_retention = PdfRetentionManager(
+    directory=settings.pdf_dir,
+    max_bytes=settings.pdf_dir_max_mb * 1024 * 1024,
+    max_age=settings.pdf_max_age_days * 24 * 3600,
+    interval=settings.pdf_retention_interval,
+)
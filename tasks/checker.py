@@ -1,8 +1,16 @@
 import re
 from decimal import Decimal, InvalidOperation
-from typing import Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
 
 NUM_PATTERN = re.compile(r"^-?\d+(?:[.,]\d+)?$")
+# Answers as scaled integers: value * 10**ANSWER_SCALE (GeneratedTask.correct_answer_fixed).
+ANSWER_SCALE = 6
+_SCALE = 10**ANSWER_SCALE
+# One entry of "1) 2.5 2) -3 3) 0,75", "1: 2.5; 2: -3" or a numbered list
+# "1. 2.5\n2. -3"; after "1." a space is required so that "1.5" stays a single
+# answer. Answers are numbers only, so a message splits into entries one way.
+BULK_ENTRY = re.compile(r"[\s;,]*(\d{1,2})\s*(?:[):]|\.(?=\s))\s*(-?\d+(?:[.,]\d+)?)[\s;,]*")
 
 
 def _normalize_answer(value: str) -> str:
@@ -19,9 +27,81 @@ def _parse_decimal(value: str) -> Tuple[Decimal, bool]:
         return Decimal(0), False
 
 
-def compare_answers(correct: str, user_input: str, tol: float = 1e-6) -> bool:
+def _to_fixed(value: str) -> Tuple[Optional[int], bool]:
+    """``(scaled integer, is a valid answer)``; the integer is None also for
+    valid answers with more than ``ANSWER_SCALE`` decimal places."""
+    # the same grammar as NUM_PATTERN, without a regex and a Decimal
+    text = value.strip()
+    negative = text[:1] == "-"
+    whole, dot, frac = (text[1:] if negative else text).replace(",", ".").partition(".")
+    if not whole.isdecimal() or (dot and not frac.isdecimal()):
+        return None, False
+    if len(frac) > ANSWER_SCALE:
+        return None, True
+    fixed = int(whole) * _SCALE + (int(frac.ljust(ANSWER_SCALE, "0")) if frac else 0)
+    return (-fixed if negative else fixed), True
+
+
+def to_fixed(value: str) -> Optional[int]:
+    """Answer as a scaled integer, or None if it is not a valid answer or has
+    more than ``ANSWER_SCALE`` decimal places."""
+    return _to_fixed(value)[0]
+
+
+@lru_cache(maxsize=8)
+def _tolerance(tol: float) -> Tuple[Decimal, Optional[int]]:
+    """``tol`` as a Decimal and, when it is a whole number of scale units, as one."""
+    tolerance = Decimal(str(tol))
+    units = tolerance.scaleb(ANSWER_SCALE)
+    return tolerance, int(units) if units == units.to_integral_value() else None
+
+
+def _compare(correct: str, user_input: str, tol: float, correct_fixed: Optional[int]) -> bool:
+    tolerance, tolerance_units = _tolerance(tol)
+    if tolerance_units is not None:
+        user_fixed, ok_user = _to_fixed(user_input)
+        if not ok_user:
+            return False
+        if correct_fixed is None:
+            correct_fixed = to_fixed(correct)
+        if correct_fixed is not None and user_fixed is not None:
+            return abs(correct_fixed - user_fixed) <= tolerance_units
+    # more decimal places than the scale holds or a tolerance finer than it
     correct_dec, ok_correct = _parse_decimal(correct)
     user_dec, ok_user = _parse_decimal(user_input)
     if not (ok_correct and ok_user):
         return False
-    return abs(correct_dec - user_dec) <= Decimal(str(tol))
+    return abs(correct_dec - user_dec) <= tolerance
+
+
+def compare_answers(correct: str, user_input: str, tol: float = 1e-6, correct_fixed: Optional[int] = None) -> bool:
+    """Compare an answer with the correct one within ``tol``.
+
+    ``correct_fixed`` is ``to_fixed(correct)`` when the caller already has it
+    (``GeneratedTask.correct_answer_fixed``).
+    """
+    return _compare(correct, user_input, tol, correct_fixed)
+
+
+def compare_answers_batch(items: Iterable[Tuple], tol: float = 1e-6) -> List[bool]:
+    """``compare_answers`` for many ``(correct, user_input)`` or
+    ``(correct, user_input, correct_fixed)`` tuples at once."""
+    return [_compare(correct, user_input, tol, rest[0] if rest else None) for correct, user_input, *rest in items]
+
+
+def parse_bulk_answers(text: str) -> Optional[Dict[int, str]]:
+    """Numbered answers from one message, or None if it is not in that format.
+
+    A plain number is a single answer, not a list. A task number given twice
+    keeps the last answer.
+    """
+    if NUM_PATTERN.match(_normalize_answer(text)):
+        return None
+    answers: Dict[int, str] = {}
+    position = 0
+    for match in BULK_ENTRY.finditer(text):
+        if match.start() != position:  # something else between the entries
+            return None
+        answers[int(match[1])] = match[2]
+        position = match.end()
+    return answers if answers and position == len(text) else None
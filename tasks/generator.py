@@ -1,10 +1,16 @@
+import hashlib
+import json
 from dataclasses import dataclass
 from decimal import Decimal, ROUND_HALF_UP
 from fractions import Fraction
+from functools import lru_cache
 from random import choice, randint
-from typing import List
+from typing import Callable, List, Optional
+
+import numpy as np
 
 from db.models import Subject
+from utils.bloom import BloomFilter
 
 
 @dataclass
@@ -13,6 +19,37 @@ class TaskPayload:
     text: str
     answer: str
     difficulty: str = "normal"
+    # canonical parameters: tasks with equal keys are the same task for the
+    # student (e.g. a triangle with the same sides in another order)
+    key: tuple = ()
+    # set by TaskGenerator: the task can be rendered again from these three
+    generator_id: str = ""
+    generator_version: int = 0
+    params: tuple = ()
+
+
+@dataclass(frozen=True)
+class TaskGenerator:
+    """A task type: ``draw`` picks random parameters, ``render`` turns them into the task.
+
+    ``render`` must stay deterministic, because stored tasks keep only
+    ``(id, version, params)`` and are rendered again when shown. To change the
+    text or the answer of a generator, register the new ``render`` under the
+    next version and keep the old one for the tasks already stored.
+    """
+
+    id: str
+    version: int
+    draw: Callable[[], tuple]
+    render: Callable[..., TaskPayload]
+
+    def __call__(self) -> TaskPayload:
+        return self.build(self.draw())
+
+    def build(self, params: tuple) -> TaskPayload:
+        task = self.render(*params)
+        task.generator_id, task.generator_version, task.params = self.id, self.version, params
+        return task
 
 
 def _finite_decimal_fraction(min_int: int = 1, max_int: int = 30, pow2: int = 3, pow5: int = 2) -> Fraction:
@@ -32,10 +69,15 @@ def _fraction_to_decimal_str(value: Fraction, places: int = 3) -> str:
     return text if text else "0"
 
 
-def _decimal_operations_task() -> TaskPayload:
+def _decimal_operations_params() -> tuple:
     a = _finite_decimal_fraction()
     b = _finite_decimal_fraction()
-    op = choice(["+", "-", "*", "/"])
+    return choice(["+", "-", "*", "/"]), a.numerator, a.denominator, b.numerator, b.denominator
+
+
+def _decimal_operations_render(op: str, a_num: int, a_den: int, b_num: int, b_den: int) -> TaskPayload:
+    a = Fraction(a_num, a_den)
+    b = Fraction(b_num, b_den)
     if op == "+":
         result = a + b
     elif op == "-":
@@ -45,26 +87,38 @@ def _decimal_operations_task() -> TaskPayload:
     else:
         b = b if b != 0 else Fraction(1, 2)
         result = a / b
-    text = f"Найдите значение выражения: { _fraction_to_decimal_str(a) } {op} { _fraction_to_decimal_str(b) }"
-    return TaskPayload(topic="decimal_arithmetics", text=text, answer=_fraction_to_decimal_str(result), difficulty="easy")
+    a_str, b_str = _fraction_to_decimal_str(a), _fraction_to_decimal_str(b)
+    text = f"Найдите значение выражения: { a_str } {op} { b_str }"
+    key = (op, *sorted((a_str, b_str))) if op in "+*" else (op, a_str, b_str)
+    return TaskPayload(
+        topic="decimal_arithmetics", text=text, answer=_fraction_to_decimal_str(result), difficulty="easy", key=key
+    )
+
 
+def _linear_equation_params() -> tuple:
+    return choice([1, 2, 4, 5, 10, 20, 25, 50]), randint(-100, 100)
 
-def _linear_equation_task() -> TaskPayload:
-    a = choice([1, 2, 4, 5, 10, 20, 25, 50])
-    b = randint(-100, 100)
-    while a == 0:
-        a = randint(1, 10)
+
+def _linear_equation_render(a: int, b: int) -> TaskPayload:
     root = Fraction(-b, a)
     text = f"Найдите корень уравнения: {a}x + {b} = 0"
-    return TaskPayload(topic="linear_equation", text=text, answer=_fraction_to_decimal_str(root), difficulty="easy")
+    return TaskPayload(
+        topic="linear_equation", text=text, answer=_fraction_to_decimal_str(root), difficulty="easy", key=(a, b)
+    )
 
 
-def _quadratic_task() -> TaskPayload:
+def _quadratic_params() -> tuple:
     # Build equation from chosen roots to control the answer
     r1 = _finite_decimal_fraction(-10, 10)
     r2 = _finite_decimal_fraction(-10, 10)
     while r1 == r2:
         r2 = _finite_decimal_fraction(-10, 10)
+    return r1.numerator, r1.denominator, r2.numerator, r2.denominator
+
+
+def _quadratic_render(n1: int, d1: int, n2: int, d2: int) -> TaskPayload:
+    r1 = Fraction(n1, d1)
+    r2 = Fraction(n2, d2)
     a = 1
     b = -(r1 + r2)
     c = r1 * r2
@@ -74,149 +128,592 @@ def _quadratic_task() -> TaskPayload:
         "В ответе напишите меньший из корней."
     )
     answer = min(r1, r2)
-    return TaskPayload(topic="quadratic_equation", text=text, answer=_fraction_to_decimal_str(answer), difficulty="normal")
+    return TaskPayload(
+        topic="quadratic_equation",
+        text=text,
+        answer=_fraction_to_decimal_str(answer),
+        difficulty="normal",
+        key=(str(answer), str(max(r1, r2))),
+    )
+
+
+def _ax2_equals_bx_params() -> tuple:
+    return choice([1, 2, 4, 5, 10]), choice([2, 4, 5, 8, 10, 20])
 
 
-def _ax2_equals_bx_task() -> TaskPayload:
-    a = choice([1, 2, 4, 5, 10])
-    b = choice([2, 4, 5, 8, 10, 20])
+def _ax2_equals_bx_render(a: int, b: int) -> TaskPayload:
     root_big = max(Fraction(0), Fraction(b, a))
     text = f"Найдите корни уравнения: {a}x^2 = {b}x. В ответ запишите больший из корней."
-    return TaskPayload(topic="ax2_eq_bx", text=text, answer=_fraction_to_decimal_str(root_big), difficulty="easy")
+    return TaskPayload(
+        topic="ax2_eq_bx", text=text, answer=_fraction_to_decimal_str(root_big), difficulty="easy", key=(a, b)
+    )
 
 
-def _probability_task() -> TaskPayload:
+def _probability_params() -> tuple:
     variant = choice(["cups", "flashlights", "taxi", "tickets"])
     total = choice([4, 5, 8, 10, 16, 20, 25, 40, 50, 80, 100])
+    if variant != "taxi":
+        # red cups / broken flashlights / unlearned tickets
+        return variant, total, randint(1, total - 1), 0
+    # leave room for at least one black and one green car
+    yellow = randint(1, total - 2)
+    black = randint(1, total - yellow - 1)
+    return variant, total, yellow, black
+
+
+def _probability_render(variant: str, total: int, k: int, black: int) -> TaskPayload:
     if variant == "cups":
-        red = randint(1, total - 1)
-        prob = Fraction(red, total)
+        prob = Fraction(k, total)
         text = (
-            f"У бабушки {total} чашек: {red} с красными цветами, остальные с синими. "
+            f"У бабушки {total} чашек: {k} с красными цветами, остальные с синими. "
             "Бабушка наливает чай в случайно выбранную чашку. Найдите вероятность, что это будет чашка с красными цветами."
         )
     elif variant == "flashlights":
-        bad = randint(1, total - 1)
-        prob = Fraction(total - bad, total)
+        prob = Fraction(total - k, total)
         text = (
-            f"В среднем из {total} фонариков, поступивших в продажу, {bad} неисправных. "
+            f"В среднем из {total} фонариков, поступивших в продажу, {k} неисправных. "
             "Найдите вероятность, что выбранный наудачу фонарик окажется исправен."
         )
     elif variant == "taxi":
-        yellow = randint(1, total - 1)
-        black = randint(1, total - yellow - 1)
-        green = total - yellow - black
-        prob = Fraction(yellow, total)
+        green = total - k - black
+        prob = Fraction(k, total)
         text = (
-            f"В фирме такси в данный момент свободно {total} машин: {black} черных, {yellow} желтых и {green} зеленых. "
+            f"В фирме такси в данный момент свободно {total} машин: {black} черных, {k} желтых и {green} зеленых. "
             "По вызову выехала одна из машин, случайно оказавшаяся ближе всего к заказчику. "
             "Найдите вероятность, что к нему приедет желтое такси."
         )
     else:  # tickets
-        unlearned = randint(1, total - 1)
-        prob = Fraction(total - unlearned, total)
+        prob = Fraction(total - k, total)
         text = (
-            f"На экзамене {total} билетов, Иван не выучил {unlearned} из них. "
+            f"На экзамене {total} билетов, Иван не выучил {k} из них. "
             "Найдите вероятность, что ему попадется выученный билет."
         )
-    return TaskPayload(topic="probability", text=text, answer=_fraction_to_decimal_str(prob), difficulty="normal")
+    # for taxis the split of the other cars does not change the task
+    return TaskPayload(
+        topic="probability",
+        text=text,
+        answer=_fraction_to_decimal_str(prob),
+        difficulty="normal",
+        key=(variant, total, k),
+    )
+
 
+def _proportion_params() -> tuple:
+    return randint(2, 12), randint(2, 12), randint(2, 12)
 
-def _proportion_task() -> TaskPayload:
+
+def _proportion_render(a: int, b: int, x: int) -> TaskPayload:
     """Простая пропорция с конечной десятичной дробью."""
-    a = randint(2, 12)
-    b = randint(2, 12)
-    x = randint(2, 12)
     y = Fraction(a * x, b)
     text = f"Решите пропорцию: {a} : {b} = x : {x}. Найдите x."
-    return TaskPayload(topic="proportion", text=text, answer=_fraction_to_decimal_str(y), difficulty="normal")
+    return TaskPayload(
+        topic="proportion", text=text, answer=_fraction_to_decimal_str(y), difficulty="normal", key=(a, b, x)
+    )
 
 
-def _triangle_angles_task() -> TaskPayload:
+def _triangle_angles_params() -> tuple:
     variant = choice(["two_angles", "right_triangle", "exterior"])
     if variant == "two_angles":
         a = randint(20, 90)
         b = randint(20, 90)
         while a + b >= 179:
             b = randint(20, 90)
+        return variant, a, b
+    if variant == "right_triangle":
+        return variant, randint(15, 75)
+    return variant, randint(30, 150)
+
+
+def _triangle_angles_render(variant: str, *angles: int) -> TaskPayload:
+    if variant == "two_angles":
+        a, b = angles
         answer = 180 - a - b
+        key = (variant, *sorted((a, b)))
         text = f"В треугольнике два угла равны {a}° и {b}°. Найдите третий угол. Ответ дайте в градусах."
     elif variant == "right_triangle":
-        a = randint(15, 75)
+        (a,) = angles
         answer = 90 - a
+        key = (variant, a)
         text = f"Один из острых углов прямоугольного треугольника равен {a}°. Найдите третий угол."
     else:
-        angle_c = randint(30, 150)
+        (angle_c,) = angles
         answer = 180 - angle_c
+        key = (variant, angle_c)
         text = f"В треугольнике ABC угол C равен {angle_c}°. Найдите внешний угол при вершине C."
-    return TaskPayload(topic="triangle_angles", text=text, answer=str(answer), difficulty="easy")
+    return TaskPayload(topic="triangle_angles", text=text, answer=str(answer), difficulty="easy", key=key)
 
 
-def _triangle_elements_task() -> TaskPayload:
+def _triangle_elements_params() -> tuple:
     variant = choice(["median", "mid_segment"])
     if variant == "median":
         ac = randint(4, 20)
-        bm = randint(3, ac)
-        answer = ac / 2
+        return variant, ac, randint(3, ac)
+    a = randint(3, 12)
+    b = randint(3, 12)
+    return variant, a, b, randint(abs(a - b) + 1, a + b - 1)
+
+
+def _triangle_elements_render(variant: str, *sides: int) -> TaskPayload:
+    if variant == "median":
+        ac, bm = sides
+        answer = Fraction(ac, 2)
+        key = (variant, ac, bm)
         text = f"В треугольнике ABC известно, что AC = {ac}, BM — медиана, BM = {bm}. Найдите AM."
     else:
-        a = randint(3, 12)
-        b = randint(3, 12)
-        c = randint(abs(a - b) + 1, a + b - 1)
-        answer = c / 2
+        a, b, c = sides
+        answer = Fraction(c, 2)
+        key = (variant, *sorted((a, b)), c)
         text = (
             f"Точки M и N — середины сторон AB и BC треугольника ABC, сторона AB = {a}, BC = {b}, AC = {c}. "
             "Найдите MN."
         )
-    return TaskPayload(topic="triangle_elements", text=text, answer=_fraction_to_decimal_str(Fraction(answer)), difficulty="normal")
+    return TaskPayload(
+        topic="triangle_elements",
+        text=text,
+        answer=_fraction_to_decimal_str(answer),
+        difficulty="normal",
+        key=key,
+    )
 
 
-def _triangle_area_task() -> TaskPayload:
+def _triangle_area_params() -> tuple:
     variant = choice(["side_height", "legs"])
     if variant == "side_height":
-        a = randint(3, 20)
-        h = randint(2, 15)
-        area = Fraction(a * h, 2)
-        text = f"Сторона треугольника равна {a}, а высота к этой стороне — {h}. Найдите площадь треугольника."
+        return variant, randint(3, 20), randint(2, 15)
+    return variant, randint(3, 15), randint(3, 15)
+
+
+def _triangle_area_render(variant: str, a: int, b: int) -> TaskPayload:
+    area = Fraction(a * b, 2)
+    if variant == "side_height":
+        key = (variant, a, b)
+        text = f"Сторона треугольника равна {a}, а высота к этой стороне — {b}. Найдите площадь треугольника."
     else:
-        a = randint(3, 15)
-        b = randint(3, 15)
-        area = Fraction(a * b, 2)
+        key = (variant, *sorted((a, b)))
         text = f"Два катета прямоугольного треугольника равны {a} и {b}. Найдите площадь треугольника."
-    return TaskPayload(topic="triangle_area", text=text, answer=_fraction_to_decimal_str(area), difficulty="easy")
+    return TaskPayload(
+        topic="triangle_area", text=text, answer=_fraction_to_decimal_str(area), difficulty="easy", key=key
+    )
 
 
-def _triangle_perimeter_task() -> TaskPayload:
+def _triangle_perimeter_params() -> tuple:
     a = randint(3, 15)
     b = randint(3, 15)
-    c = randint(abs(a - b) + 1, a + b - 1)
+    return a, b, randint(abs(a - b) + 1, a + b - 1)
+
+
+def _triangle_perimeter_render(a: int, b: int, c: int) -> TaskPayload:
     perimeter = a + b + c
     text = f"Стороны треугольника равны {a}, {b}, {c}. Найдите периметр."
-    return TaskPayload(topic="triangle_perimeter", text=text, answer=str(perimeter), difficulty="easy")
+    return TaskPayload(
+        topic="triangle_perimeter", text=text, answer=str(perimeter), difficulty="easy", key=tuple(sorted((a, b, c)))
+    )
 
 
-def generate_tasks(subject: Subject, count: int, difficulty: str = "normal") -> List[TaskPayload]:
-    generators = []
-    if subject == Subject.algebra:
-        generators = [
-            _decimal_operations_task,
-            _linear_equation_task,
-            _quadratic_task,
-            _ax2_equals_bx_task,
-            _probability_task,
-            _proportion_task,
-        ]
-    elif subject == Subject.geometry:
-        generators = [
-            _triangle_angles_task,
-            _triangle_elements_task,
-            _triangle_area_task,
-            _triangle_perimeter_task,
-        ]
+_decimal_operations_task = TaskGenerator("decimal_arithmetics", 1, _decimal_operations_params, _decimal_operations_render)
+_linear_equation_task = TaskGenerator("linear_equation", 1, _linear_equation_params, _linear_equation_render)
+_quadratic_task = TaskGenerator("quadratic_equation", 1, _quadratic_params, _quadratic_render)
+_ax2_equals_bx_task = TaskGenerator("ax2_eq_bx", 1, _ax2_equals_bx_params, _ax2_equals_bx_render)
+_probability_task = TaskGenerator("probability", 1, _probability_params, _probability_render)
+_proportion_task = TaskGenerator("proportion", 1, _proportion_params, _proportion_render)
+_triangle_angles_task = TaskGenerator("triangle_angles", 1, _triangle_angles_params, _triangle_angles_render)
+_triangle_elements_task = TaskGenerator("triangle_elements", 1, _triangle_elements_params, _triangle_elements_render)
+_triangle_area_task = TaskGenerator("triangle_area", 1, _triangle_area_params, _triangle_area_render)
+_triangle_perimeter_task = TaskGenerator("triangle_perimeter", 1, _triangle_perimeter_params, _triangle_perimeter_render)
+
+SUBJECT_GENERATORS: dict[Subject, list[TaskGenerator]] = {
+    Subject.algebra: [
+        _decimal_operations_task,
+        _linear_equation_task,
+        _quadratic_task,
+        _ax2_equals_bx_task,
+        _probability_task,
+        _proportion_task,
+    ],
+    Subject.geometry: [
+        _triangle_angles_task,
+        _triangle_elements_task,
+        _triangle_area_task,
+        _triangle_perimeter_task,
+    ],
+}
+# every (id, version) ever stored must stay here, old versions included
+GENERATORS: dict[tuple[str, int], TaskGenerator] = {
+    (generator.id, generator.version): generator for generators in SUBJECT_GENERATORS.values() for generator in generators
+}
+RENDER_CACHE_SIZE = 4096
+
+
+def pack_params(params: tuple) -> str:
+    return json.dumps(params, ensure_ascii=False, separators=(",", ":"))
+
+
+def unpack_params(packed: str) -> tuple:
+    return tuple(json.loads(packed))
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_task(generator_id: str, generator_version: int, params: tuple) -> TaskPayload:
+    """Task rendered again from its stored generator and parameters.
+
+    The result is shared by the cache and must not be modified.
+    """
+    generator = GENERATORS.get((generator_id, generator_version))
+    if generator is None:
+        raise ValueError(f"Unknown task generator {generator_id!r} version {generator_version}")
+    return generator.build(params)
+
+
+MAX_RESAMPLES = 20
+
+
+def task_fingerprint(task: TaskPayload) -> int:
+    """Stable 64-bit fingerprint of the task's canonical parameters."""
+    key = (task.topic, task.key) if task.key else (task.topic, task.text)
+    return int.from_bytes(hashlib.blake2b(repr(key).encode(), digest_size=8).digest(), "little")
+
+
+def generate_tasks(
+    subject: Subject, count: int, difficulty: str = "normal", seen: Optional[BloomFilter] = None
+) -> List[TaskPayload]:
+    """``count`` random tasks; with ``seen`` (the student's filter, updated in
+    place) parameters the student already had are drawn again."""
+    generators = SUBJECT_GENERATORS.get(subject, [])
     tasks: List[TaskPayload] = []
     for _ in range(count):
         gen = choice(generators)
         task = gen()
+        if seen is not None:
+            # small topics run out of new parameters: then a repeat is allowed
+            fingerprint = task_fingerprint(task)
+            for _ in range(MAX_RESAMPLES):
+                if fingerprint not in seen:
+                    break
+                task = gen()
+                fingerprint = task_fingerprint(task)
+            seen.add(fingerprint)
         task.difficulty = difficulty
         tasks.append(task)
     return tasks
+
+
+# --- Batch generation -------------------------------------------------------
+#
+# The batch API mirrors the ``_*_task`` functions above, but draws the
+# parameters of all tasks of one topic at once from a seeded NumPy generator
+# and computes the answers on integer numerator/denominator arrays instead of
+# per-object ``Fraction``s. Only the final string formatting stays per task.
+# Every task keeps the parameters of the matching ``TaskGenerator``, so it is
+# stored compactly and renders again to the same text.
+
+_POW2_CHOICES = np.array([1, 2, 4, 8], dtype=np.int64)
+_POW5_CHOICES = np.array([1, 5, 25], dtype=np.int64)
+
+
+def _finite_decimal_fraction_batch(
+    rng: np.random.Generator,
+    n: int,
+    min_int: int = 1,
+    max_int: int = 30,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Vectorized ``_finite_decimal_fraction``: numerators and 2^a * 5^b denominators."""
+    numerators = rng.integers(min_int, max_int + 1, size=n)
+    denominators = rng.choice(_POW2_CHOICES, size=n) * rng.choice(_POW5_CHOICES, size=n)
+    return numerators, denominators
+
+
+def _batch_task(generator: TaskGenerator, params: tuple, text: str, answer: str, difficulty: str) -> TaskPayload:
+    return TaskPayload(
+        topic=generator.id,
+        text=text,
+        answer=answer,
+        difficulty=difficulty,
+        generator_id=generator.id,
+        generator_version=generator.version,
+        params=params,
+    )
+
+
+def _decimal_strs(numerators: np.ndarray, denominators: np.ndarray, places: int = 3) -> List[str]:
+    """Vectorized ``_fraction_to_decimal_str`` (ROUND_HALF_UP to ``places`` digits).
+
+    Denominators must be positive; the sign is carried by the numerators.
+    Like the scalar version, a negative value that rounds to zero gives "-0".
+    """
+    scale = 10**places
+    negative = numerators < 0
+    den = denominators
+    scaled = (np.abs(numerators) * scale * 2 + den) // (den * 2)
+    whole, frac = np.divmod(scaled, scale)
+    result = []
+    for neg, w, f in zip(negative.tolist(), whole.tolist(), frac.tolist()):
+        text = str(w)
+        if f:
+            text += "." + str(f).rjust(places, "0").rstrip("0")
+        if neg:
+            text = "-" + text
+        result.append(text)
+    return result
+
+
+def _decimal_operations_batch(rng: np.random.Generator, n: int) -> List[TaskPayload]:
+    na, da = _finite_decimal_fraction_batch(rng, n)
+    nb, db = _finite_decimal_fraction_batch(rng, n)
+    ops = rng.integers(0, 4, size=n)
+    res_num = np.select(
+        [ops == 0, ops == 1, ops == 2],
+        [na * db + nb * da, na * db - nb * da, na * nb],
+        default=na * db,
+    )
+    res_den = np.where(ops == 3, da * nb, da * db)
+    a_strs = _decimal_strs(na, da)
+    b_strs = _decimal_strs(nb, db)
+    answers = _decimal_strs(res_num, res_den)
+    symbols = ["+", "-", "*", "/"]
+    return [
+        _batch_task(
+            _decimal_operations_task,
+            (symbols[op], *fractions),
+            f"Найдите значение выражения: {a} {symbols[op]} {b}",
+            answer,
+            "easy",
+        )
+        for a, op, b, answer, *fractions in zip(
+            a_strs, ops.tolist(), b_strs, answers, na.tolist(), da.tolist(), nb.tolist(), db.tolist()
+        )
+    ]
+
+
+def _linear_equation_batch(rng: np.random.Generator, n: int) -> List[TaskPayload]:
+    a = rng.choice(np.array([1, 2, 4, 5, 10, 20, 25, 50]), size=n)
+    b = rng.integers(-100, 101, size=n)
+    answers = _decimal_strs(-b, a)
+    return [
+        _batch_task(_linear_equation_task, (a_, b_), f"Найдите корень уравнения: {a_}x + {b_} = 0", answer, "easy")
+        for a_, b_, answer in zip(a.tolist(), b.tolist(), answers)
+    ]
+
+
+def _quadratic_batch(rng: np.random.Generator, n: int) -> List[TaskPayload]:
+    n1, d1 = _finite_decimal_fraction_batch(rng, n, -10, 10)
+    n2, d2 = _finite_decimal_fraction_batch(rng, n, -10, 10)
+    same = n1 * d2 == n2 * d1
+    while same.any():
+        count = int(same.sum())
+        n2[same], d2[same] = _finite_decimal_fraction_batch(rng, count, -10, 10)
+        same = n1 * d2 == n2 * d1
+    den = d1 * d2
+    b_strs = _decimal_strs(-(n1 * d2 + n2 * d1), den)
+    c_strs = _decimal_strs(n1 * n2, den)
+    first_smaller = n1 * d2 < n2 * d1
+    answers = _decimal_strs(np.where(first_smaller, n1, n2), np.where(first_smaller, d1, d2))
+    return [
+        _batch_task(
+            _quadratic_task,
+            tuple(roots),
+            "Найдите корни уравнения: "
+            f"1x^2 + ({b})x + {c} = 0. "
+            "В ответе напишите меньший из корней.",
+            answer,
+            "normal",
+        )
+        for b, c, answer, *roots in zip(b_strs, c_strs, answers, n1.tolist(), d1.tolist(), n2.tolist(), d2.tolist())
+    ]
+
+
+def _ax2_equals_bx_batch(rng: np.random.Generator, n: int) -> List[TaskPayload]:
+    a = rng.choice(np.array([1, 2, 4, 5, 10]), size=n)
+    b = rng.choice(np.array([2, 4, 5, 8, 10, 20]), size=n)
+    answers = _decimal_strs(b, a)
+    return [
+        _batch_task(
+            _ax2_equals_bx_task,
+            (a_, b_),
+            f"Найдите корни уравнения: {a_}x^2 = {b_}x. В ответ запишите больший из корней.",
+            answer,
+            "easy",
+        )
+        for a_, b_, answer in zip(a.tolist(), b.tolist(), answers)
+    ]
+
+
+_PROBABILITY_VARIANTS = ["cups", "flashlights", "taxi", "tickets"]
+
+
+def _probability_batch(rng: np.random.Generator, n: int) -> List[TaskPayload]:
+    variants = rng.integers(0, 4, size=n)
+    total = rng.choice(np.array([4, 5, 8, 10, 16, 20, 25, 40, 50, 80, 100]), size=n)
+    # ``k`` is the red cups / broken flashlights / yellow taxis / unlearned tickets.
+    # For taxis it must leave room for at least one black and one green car.
+    k = rng.integers(1, np.where(variants == 2, total - 1, total))
+    black = rng.integers(1, np.maximum(total - k, 2))
+    favourable = np.where((variants == 0) | (variants == 2), k, total - k)
+    answers = _decimal_strs(favourable, total)
+    tasks = []
+    for variant, t, k_, black_, answer in zip(variants.tolist(), total.tolist(), k.tolist(), black.tolist(), answers):
+        if variant == 0:
+            text = (
+                f"У бабушки {t} чашек: {k_} с красными цветами, остальные с синими. "
+                "Бабушка наливает чай в случайно выбранную чашку. Найдите вероятность, что это будет чашка с красными цветами."
+            )
+        elif variant == 1:
+            text = (
+                f"В среднем из {t} фонариков, поступивших в продажу, {k_} неисправных. "
+                "Найдите вероятность, что выбранный наудачу фонарик окажется исправен."
+            )
+        elif variant == 2:
+            text = (
+                f"В фирме такси в данный момент свободно {t} машин: {black_} черных, {k_} желтых и {t - k_ - black_} зеленых. "
+                "По вызову выехала одна из машин, случайно оказавшаяся ближе всего к заказчику. "
+                "Найдите вероятность, что к нему приедет желтое такси."
+            )
+        else:
+            text = (
+                f"На экзамене {t} билетов, Иван не выучил {k_} из них. "
+                "Найдите вероятность, что ему попадется выученный билет."
+            )
+        params = (_PROBABILITY_VARIANTS[variant], t, k_, black_ if variant == 2 else 0)
+        tasks.append(_batch_task(_probability_task, params, text, answer, "normal"))
+    return tasks
+
+
+def _proportion_batch(rng: np.random.Generator, n: int) -> List[TaskPayload]:
+    a, b, x = rng.integers(2, 13, size=(3, n))
+    answers = _decimal_strs(a * x, b)
+    return [
+        _batch_task(
+            _proportion_task, (a_, b_, x_), f"Решите пропорцию: {a_} : {b_} = x : {x_}. Найдите x.", answer, "normal"
+        )
+        for a_, b_, x_, answer in zip(a.tolist(), b.tolist(), x.tolist(), answers)
+    ]
+
+
+def _triangle_angles_batch(rng: np.random.Generator, n: int) -> List[TaskPayload]:
+    variants = rng.integers(0, 3, size=n)
+    a = rng.integers(20, 91, size=n)
+    b = rng.integers(20, 91, size=n)
+    too_big = a + b >= 179
+    while too_big.any():
+        b[too_big] = rng.integers(20, 91, size=int(too_big.sum()))
+        too_big = a + b >= 179
+    acute = rng.integers(15, 76, size=n)
+    angle_c = rng.integers(30, 151, size=n)
+    answers = np.select([variants == 0, variants == 1], [180 - a - b, 90 - acute], default=180 - angle_c)
+    tasks = []
+    for variant, a_, b_, acute_, c_, answer in zip(
+        variants.tolist(), a.tolist(), b.tolist(), acute.tolist(), angle_c.tolist(), answers.tolist()
+    ):
+        if variant == 0:
+            params = ("two_angles", a_, b_)
+            text = f"В треугольнике два угла равны {a_}° и {b_}°. Найдите третий угол. Ответ дайте в градусах."
+        elif variant == 1:
+            params = ("right_triangle", acute_)
+            text = f"Один из острых углов прямоугольного треугольника равен {acute_}°. Найдите третий угол."
+        else:
+            params = ("exterior", c_)
+            text = f"В треугольнике ABC угол C равен {c_}°. Найдите внешний угол при вершине C."
+        tasks.append(_batch_task(_triangle_angles_task, params, text, str(answer), "easy"))
+    return tasks
+
+
+def _triangle_sides_batch(rng: np.random.Generator, n: int, low: int, high: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Two sides in ``[low, high]`` and a third one satisfying the triangle inequality."""
+    a = rng.integers(low, high + 1, size=n)
+    b = rng.integers(low, high + 1, size=n)
+    c = rng.integers(np.abs(a - b) + 1, a + b)
+    return a, b, c
+
+
+def _triangle_elements_batch(rng: np.random.Generator, n: int) -> List[TaskPayload]:
+    is_median = rng.integers(0, 2, size=n) == 0
+    ac = rng.integers(4, 21, size=n)
+    bm = rng.integers(3, ac + 1)
+    a, b, c = _triangle_sides_batch(rng, n, 3, 12)
+    answers = _decimal_strs(np.where(is_median, ac, c), np.full(n, 2))
+    tasks = []
+    for median, ac_, bm_, a_, b_, c_, answer in zip(
+        is_median.tolist(), ac.tolist(), bm.tolist(), a.tolist(), b.tolist(), c.tolist(), answers
+    ):
+        if median:
+            params = ("median", ac_, bm_)
+            text = f"В треугольнике ABC известно, что AC = {ac_}, BM — медиана, BM = {bm_}. Найдите AM."
+        else:
+            params = ("mid_segment", a_, b_, c_)
+            text = (
+                f"Точки M и N — середины сторон AB и BC треугольника ABC, сторона AB = {a_}, BC = {b_}, AC = {c_}. "
+                "Найдите MN."
+            )
+        tasks.append(_batch_task(_triangle_elements_task, params, text, answer, "normal"))
+    return tasks
+
+
+def _triangle_area_batch(rng: np.random.Generator, n: int) -> List[TaskPayload]:
+    side_height = rng.integers(0, 2, size=n) == 0
+    a = np.where(side_height, rng.integers(3, 21, size=n), rng.integers(3, 16, size=n))
+    b = np.where(side_height, rng.integers(2, 16, size=n), rng.integers(3, 16, size=n))
+    answers = _decimal_strs(a * b, np.full(n, 2))
+    tasks = []
+    for sh, a_, b_, answer in zip(side_height.tolist(), a.tolist(), b.tolist(), answers):
+        if sh:
+            params = ("side_height", a_, b_)
+            text = f"Сторона треугольника равна {a_}, а высота к этой стороне — {b_}. Найдите площадь треугольника."
+        else:
+            params = ("legs", a_, b_)
+            text = f"Два катета прямоугольного треугольника равны {a_} и {b_}. Найдите площадь треугольника."
+        tasks.append(_batch_task(_triangle_area_task, params, text, answer, "easy"))
+    return tasks
+
+
+def _triangle_perimeter_batch(rng: np.random.Generator, n: int) -> List[TaskPayload]:
+    a, b, c = _triangle_sides_batch(rng, n, 3, 15)
+    return [
+        _batch_task(
+            _triangle_perimeter_task,
+            (a_, b_, c_),
+            f"Стороны треугольника равны {a_}, {b_}, {c_}. Найдите периметр.",
+            str(p),
+            "easy",
+        )
+        for a_, b_, c_, p in zip(a.tolist(), b.tolist(), c.tolist(), (a + b + c).tolist())
+    ]
+
+
+_BATCH_GENERATORS = {
+    Subject.algebra: [
+        _decimal_operations_batch,
+        _linear_equation_batch,
+        _quadratic_batch,
+        _ax2_equals_bx_batch,
+        _probability_batch,
+        _proportion_batch,
+    ],
+    Subject.geometry: [
+        _triangle_angles_batch,
+        _triangle_elements_batch,
+        _triangle_area_batch,
+        _triangle_perimeter_batch,
+    ],
+}
+
+
+def generate_tasks_batch(
+    subject: Subject,
+    count: int,
+    difficulty: str = "normal",
+    seed: Optional[int] = None,
+) -> List[TaskPayload]:
+    """Generate ``count`` tasks at once; the same ``seed`` always gives the same tasks."""
+    generators = _BATCH_GENERATORS.get(subject, [])
+    if not generators or count <= 0:
+        return []
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(generators), size=count)
+    tasks: List[Optional[TaskPayload]] = [None] * count
+    for idx, gen in enumerate(generators):
+        positions = np.flatnonzero(picks == idx)
+        if not positions.size:
+            continue
+        for pos, task in zip(positions.tolist(), gen(rng, positions.size)):
+            task.difficulty = difficulty
+            tasks[pos] = task
+    return tasks
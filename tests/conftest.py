@@ -0,0 +1,26 @@
+from typing import NamedTuple
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from db import models
+
+
+class Database(NamedTuple):
+    engine: AsyncEngine
+    sessions: async_sessionmaker[AsyncSession]
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A temporary SQLite file with the full schema, its engine and session factory."""
+    path = tmp_path / "test.db"
+    schema_engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(schema_engine)
+    schema_engine.dispose()
+    # every test runs its own event loop: no pooled connection may outlive it
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    yield Database(engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+    engine.sync_engine.dispose()
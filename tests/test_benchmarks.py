@@ -0,0 +1,35 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from benchmarks.micro import Result, compare
+from benchmarks.synthetic import build_synthetic_db
+from db.repository import calc_stats
+
+
+def test_compare_flags_only_cases_past_their_threshold():
+    baseline = {
+        "fast": {"median_us": 10.0, "threshold": 0.3},
+        "slow": {"median_us": 10.0, "threshold": 0.3},
+        "noisy": {"median_us": 10.0, "threshold": 1.0},
+    }
+    results = [Result("fast", 12.0, 11.0, 0.3), Result("slow", 14.0, 13.0, 0.3), Result("noisy", 19.0, 18.0, 1.0)]
+    assert compare(baseline, results) == ["slow"]
+    assert compare(baseline, results, threshold=0.1) == ["fast", "slow", "noisy"]
+    assert compare({}, results) == []
+
+
+async def _stats(url):
+    engine = create_async_engine(url)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with sessions() as session:
+        totals = [(await calc_stats(session, user_id))["total_attempts"] for user_id in (1, 2, 3)]
+    await engine.dispose()
+    return totals
+
+
+def test_synthetic_db_fills_counters(tmp_path):
+    path = build_synthetic_db(tmp_path / "synthetic.db", users=3, attempts=300)
+    totals = asyncio.run(_stats(f"sqlite+aiosqlite:///{path}"))
+    assert sum(totals) == 300
+    assert all(totals)
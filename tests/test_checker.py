@@ -1,4 +1,6 @@
-from tasks.checker import compare_answers
+import time
+
+from tasks.checker import compare_answers, compare_answers_batch, parse_bulk_answers, to_fixed
 
 
 def test_compare_accepts_decimal_and_integer_only():
@@ -12,3 +14,35 @@ def test_compare_accepts_decimal_and_integer_only():
 def test_compare_negative_and_whitespace():
     assert compare_answers("-1.25", " -1.25 ")
     assert not compare_answers("-1.25", "1.25")
+
+
+def test_parse_bulk_answers():
+    assert parse_bulk_answers("1) 2.5 2) -3 3) 0,75") == {1: "2.5", 2: "-3", 3: "0,75"}
+    assert parse_bulk_answers("1. 2.5\n2. -3\n3: 1,5,") == {1: "2.5", 2: "-3", 3: "1,5"}
+    assert parse_bulk_answers("1.5") is None  # a single answer, not task 1
+    assert parse_bulk_answers("12") is None
+    assert parse_bulk_answers("1) 2.5 и 2) 3") is None
+    assert parse_bulk_answers("1) x 2) 3") is None  # answers are numbers only
+
+
+def test_parse_bulk_answers_runs_in_linear_time():
+    started = time.perf_counter()
+    for text in ("1)" * 2000 + " x y", "1) " * 2000 + "x", "1) 1 " * 2000 + ";x", "1)" + "1" * 4000 + ")"):
+        assert parse_bulk_answers(text) is None
+    assert time.perf_counter() - started < 0.5
+
+
+def test_compare_answers_batch():
+    pairs = [("0.5", "0,5"), ("-1.25", "1.25"), ("3", "1/2"), ("2", "2.0000001")]
+    assert compare_answers_batch(pairs) == [compare_answers(c, u) for c, u in pairs] == [True, False, False, True]
+
+
+def test_fixed_point_answers():
+    assert to_fixed("0,75") == to_fixed(" 0.750 ") == 750_000
+    assert to_fixed("-3") == -3_000_000
+    assert to_fixed("1.1234567") is None  # too many decimals for the scale
+    assert to_fixed("1/2") is None
+    assert compare_answers("0.75", "0,75", correct_fixed=750_000)
+    assert compare_answers("2", "2.0000001")  # Decimal fallback, within 1e-6
+    assert not compare_answers("0.5", "0.51", tol=1e-3)
+    assert compare_answers("0.5", "0.5004", tol=0.0005)  # tolerance finer than the scale unit
@@ -0,0 +1,37 @@
+import asyncio
+import dataclasses
+
+from sqlalchemy import text
+
+from core.config import load_settings
+from db.engine import create_engine, engine_options
+
+
+async def _pragmas(url, settings):
+    engine = create_engine(settings, url)
+    async with engine.connect() as conn:
+        values = [
+            (await conn.execute(text(f"PRAGMA {name}"))).scalar()
+            for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size")
+        ]
+    await engine.dispose()
+    return values
+
+
+def test_sqlite_profile_applies_pragmas_on_connect(tmp_path):
+    settings = dataclasses.replace(load_settings(), sqlite_busy_timeout_ms=1234, sqlite_cache_mb=8)
+    journal, synchronous, busy_timeout, cache_size = asyncio.run(
+        _pragmas(f"sqlite+aiosqlite:///{tmp_path / 'tuned.db'}", settings)
+    )
+    assert journal == "wal"
+    assert synchronous == 1  # NORMAL
+    assert busy_timeout == 1234
+    assert cache_size == -8 * 1024
+
+
+def test_postgres_profile_sizes_pool():
+    settings = dataclasses.replace(load_settings(), pg_pool_size=7, pg_statement_cache_size=0)
+    options = engine_options(settings, "postgresql+asyncpg://bot@localhost/bot")
+    assert options["pool_size"] == 7
+    assert options["connect_args"] == {"prepared_statement_cache_size": 0, "statement_cache_size": 0}
+    assert engine_options(settings, "sqlite+aiosqlite:///bot.db") == {}
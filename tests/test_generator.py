@@ -1,7 +1,22 @@
+import asyncio
+import random
+import re
 from fractions import Fraction
 
-from db.models import Subject
-from tasks.generator import generate_tasks
+from sqlalchemy import select
+
+from db.models import GeneratedTask, Subject
+from db.repository import create_task_set, create_user, task_text
+from tasks.generator import (
+    TaskPayload,
+    generate_tasks,
+    generate_tasks_batch,
+    pack_params,
+    render_task,
+    task_fingerprint,
+    unpack_params,
+)
+from utils.bloom import BloomFilter
 
 
 def _is_finite_decimal(text: str) -> bool:
@@ -26,3 +41,99 @@ def test_generate_geometry_answers_numeric():
     for task in tasks:
         # answers должны быть приводимы к Fraction
         Fraction(task.answer)
+
+
+TAXI_COUNTS = re.compile(r"свободно (\d+) машин: (\d+) черных, (\d+) желтых и (\d+) зеленых")
+
+
+def test_taxi_task_has_cars_of_every_colour():
+    random.seed(0)
+    counts = [TAXI_COUNTS.search(task.text) for task in generate_tasks(Subject.algebra, 3000)]
+    counts = [tuple(map(int, match.groups())) for match in counts if match]
+    assert counts
+    for total, black, yellow, green in counts:
+        assert min(black, yellow, green) >= 1
+        assert black + yellow + green == total
+
+
+def test_generate_batch_is_seeded_and_finite():
+    tasks = generate_tasks_batch(Subject.algebra, 500, seed=42)
+    assert len(tasks) == 500
+    assert tasks == generate_tasks_batch(Subject.algebra, 500, seed=42)
+    for task in tasks:
+        assert _is_finite_decimal(task.answer)
+
+
+def test_generate_batch_covers_same_topics_as_scalar_generators():
+    algebra_topics = {t.topic for t in generate_tasks_batch(Subject.algebra, 500, seed=1)}
+    geometry_topics = {t.topic for t in generate_tasks_batch(Subject.geometry, 500, seed=1)}
+    assert algebra_topics == {
+        "decimal_arithmetics",
+        "linear_equation",
+        "quadratic_equation",
+        "ax2_eq_bx",
+        "probability",
+        "proportion",
+    }
+    assert geometry_topics == {"triangle_angles", "triangle_elements", "triangle_area", "triangle_perimeter"}
+
+
+def test_generate_batch_decimal_answers_match_fraction_arithmetic():
+    ops = {"+": lambda a, b: a + b, "-": lambda a, b: a - b, "*": lambda a, b: a * b, "/": lambda a, b: a / b}
+    for task in generate_tasks_batch(Subject.algebra, 300, seed=7):
+        if task.topic != "decimal_arithmetics":
+            continue
+        a, op, b = task.text.split(": ", 1)[1].split()
+        expected = ops[op](Fraction(a), Fraction(b))
+        assert abs(Fraction(task.answer) - expected) <= Fraction(1, 2000)
+
+
+def test_seen_filter_avoids_repeats():
+    seen = BloomFilter(8192)
+    fingerprints = [task_fingerprint(t) for _ in range(20) for t in generate_tasks(Subject.geometry, 10, seen=seen)]
+    assert len(set(fingerprints)) == len(fingerprints)
+    restored = BloomFilter(8192, data=seen.to_bytes())
+    assert all(fingerprint in restored for fingerprint in fingerprints)
+    assert BloomFilter(4096, data=seen.to_bytes()).fill_ratio() == 0  # other size: start over
+
+
+def test_fingerprint_is_canonical():
+    a = TaskPayload(topic="triangle_perimeter", text="3, 4, 5", answer="12", key=(3, 4, 5))
+    b = TaskPayload(topic="triangle_perimeter", text="5, 3, 4", answer="12", key=(3, 4, 5))
+    assert task_fingerprint(a) == task_fingerprint(b)
+    assert task_fingerprint(a) != task_fingerprint(TaskPayload(topic="triangle_area", text="", answer="12", key=(3, 4, 5)))
+
+
+def test_tasks_render_again_from_params():
+    for subject in Subject:
+        for task in generate_tasks(subject, 50):
+            again = render_task(task.generator_id, task.generator_version, unpack_params(pack_params(task.params)))
+            assert (again.text, again.answer, again.key) == (task.text, task.answer, task.key)
+
+
+def test_batch_tasks_render_again_from_params():
+    for subject in Subject:
+        for task in generate_tasks_batch(subject, 500, seed=3):
+            again = render_task(task.generator_id, task.generator_version, unpack_params(pack_params(task.params)))
+            assert (again.topic, again.text, again.answer) == (task.topic, task.text, task.answer)
+
+
+async def _store_compact(sessions, generated):
+    rows = [
+        {"topic": t.topic, "answer": t.answer, "generator_id": t.generator_id, "generator_version": t.generator_version, "params": t.params}
+        for t in generated
+    ]
+    async with sessions() as session:
+        user = await create_user(session, tg_id=301, full_name="Ученик", grade="9А")
+        await create_task_set(session, user_id=user.id, subject=Subject.geometry, tasks=rows)
+    async with sessions() as session:
+        tasks = (await session.execute(select(GeneratedTask).order_by(GeneratedTask.order_index))).scalars().all()
+    return tasks
+
+
+def test_compact_task_storage(database):
+    generated = generate_tasks(Subject.geometry, 5)
+    tasks = asyncio.run(_store_compact(database.sessions, generated))
+    assert [t.text for t in tasks] == [""] * 5
+    assert [task_text(t) for t in tasks] == [t.text for t in generated]
+    assert [t.correct_answer for t in tasks] == [t.answer for t in generated]
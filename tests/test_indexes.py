@@ -0,0 +1,84 @@
+import asyncio
+import sqlite3
+
+from sqlalchemy import create_engine, event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from db import base, models
+from db.base import MIGRATIONS, _migrate, schema_version
+from db.repository import calc_stats, get_latest_open_task_set, get_task_by_order, get_task_set_tasks
+
+HOT_INDEXES = {"ix_generated_tasks_set_order", "ix_task_sets_open_by_user", "ix_answer_attempts_user_created"}
+
+
+def _index_names(engine):
+    inspector = inspect(engine)
+    return {index["name"] for table in inspector.get_table_names() for index in inspector.get_indexes(table)}
+
+
+def test_migration_adds_indexes_to_existing_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in HOT_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+    assert not HOT_INDEXES & _index_names(engine)
+
+    for _ in range(2):  # the second run must be a no-op
+        with engine.connect() as conn:
+            _migrate(conn)
+    assert HOT_INDEXES <= _index_names(engine)
+    with engine.connect() as conn:
+        assert conn.execute(schema_version.select()).scalars().all() == [MIGRATIONS[-1][0]]
+
+
+async def _capture_hot_queries(url):
+    engine = create_async_engine(url)
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with async_sessionmaker(engine, class_=AsyncSession)() as session:
+        await get_task_by_order(session, 1, 1)
+        await get_task_set_tasks(session, 1)
+        await get_latest_open_task_set(session, 1)
+        await calc_stats(session, 1)
+    await engine.dispose()
+    return statements
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    path = tmp_path / "plan.db"
+    statements = asyncio.run(_capture_hot_queries(f"sqlite+aiosqlite:///{path}"))
+    assert len(statements) == 5
+
+    with sqlite3.connect(path) as conn:
+        for statement, parameters in statements:
+            plan = " ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters))
+            assert "SEARCH" in plan and "SCAN" not in plan, (statement, plan)
+
+
+def test_migration_backfills_fixed_answers(tmp_path, monkeypatch):
+    monkeypatch.setattr(base, "BACKFILL_BATCH_SIZE", 2)
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    models.Base.metadata.create_all(engine)
+    tasks = models.GeneratedTask.__table__
+    with engine.begin() as conn:
+        conn.execute(
+            tasks.insert(),
+            [
+                {"task_set_id": 1, "order_index": i, "subject": "algebra", "topic": "t", "text": "?", "correct_answer": answer}
+                for i, answer in enumerate(["1.25", "0.1234567", "-3", "7", "0.5"], start=1)
+            ],
+        )
+    with engine.connect() as conn:
+        _migrate(conn)
+    with engine.connect() as conn:
+        fixed = conn.execute(select(tasks.c.correct_answer_fixed).order_by(tasks.c.order_index)).scalars().all()
+    # the unparseable answer stays NULL and does not stop the later batches
+    assert fixed == [1_250_000, None, -3_000_000, 7_000_000, 500_000]
@@ -0,0 +1,36 @@
+from pdf.layout import pack_blocks, string_width, wrap_text
+
+
+def test_wrap_text_fits_measured_width():
+    text = "В фирме такси в данный момент свободно 20 машин: 3 черных, 5 желтых и 12 зеленых."
+    lines = wrap_text(text, max_width=120, font_name="Helvetica", font_size=11)
+    assert len(lines) > 1
+    assert " ".join(lines) == text
+    for line in lines:
+        assert string_width(line, "Helvetica", 11) <= 120
+
+
+def test_wrap_text_splits_overlong_word():
+    lines = wrap_text("x" * 100, max_width=50, font_name="Helvetica", font_size=11)
+    assert "".join(lines) == "x" * 100
+    assert all(string_width(line, "Helvetica", 11) <= 50 for line in lines)
+
+
+def test_pack_blocks_keeps_each_block_in_one_column():
+    blocks = [["line"] * 3 for _ in range(5)]
+    placed = pack_blocks(
+        blocks,
+        columns=2,
+        left=0,
+        column_width=100,
+        gutter=10,
+        first_page_top=100,
+        page_top=100,
+        bottom=0,
+        leading=10,
+        block_gap=5,
+    )
+    # a 100pt column holds three 30pt blocks with gaps, the fourth starts column two
+    assert [(b.page, b.x) for b in placed] == [(0, 0), (0, 0), (0, 0), (0, 110), (0, 110)]
+    for block in placed:
+        assert block.y - len(block.lines) * 10 >= 0
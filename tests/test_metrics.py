@@ -0,0 +1,84 @@
+import asyncio
+import socket
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message, Update
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from sqlalchemy import text
+
+from bot.middlewares import MetricsMiddleware
+from core.config import load_settings
+from core.metrics import Gauge, Histogram, Registry, build_metrics_app, registry, start_metrics_server
+from db.engine import create_engine
+
+
+def test_histogram_exposition():
+    metrics = Registry()
+    latency = metrics.register(Histogram("demo_seconds", "Demo.", ["op"], buckets=(0.1, 1.0)))
+    depth = metrics.register(Gauge("demo_depth", "Demo.", ["queue"]))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, op='say "hi"')
+    depth.track(lambda: 3, queue="a")
+
+    body = asyncio.run(metrics.render())
+    assert '# TYPE demo_seconds histogram' in body
+    assert 'demo_seconds_bucket{op="say \\"hi\\"",le="0.1"} 1' in body
+    assert 'demo_seconds_bucket{op="say \\"hi\\"",le="1"} 2' in body
+    assert 'demo_seconds_bucket{op="say \\"hi\\"",le="+Inf"} 3' in body
+    assert 'demo_seconds_sum{op="say \\"hi\\""} 5.55' in body
+    assert 'demo_seconds_count{op="say \\"hi\\""} 3' in body
+    assert 'demo_depth{queue="a"} 3' in body
+
+
+async def _scenario(url):
+    engine = create_engine(load_settings(), url=url)
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    await engine.dispose()
+
+    router = Router()
+
+    @router.message()
+    async def echo(message: Message) -> None:
+        pass
+
+    dp = Dispatcher()
+    dp.message.middleware(MetricsMiddleware())
+    dp.include_router(router)
+    bot = Bot("42:TEST")
+    update = Update.model_validate(
+        {
+            "update_id": 1,
+            "message": {
+                "message_id": 1,
+                "date": 1700000000,
+                "chat": {"id": 42, "type": "private"},
+                "from": {"id": 42, "is_bot": False, "first_name": "Ученик"},
+                "text": "15",
+            },
+        }
+    )
+    await dp.feed_update(bot, update)
+    await bot.session.close()
+
+    async with TestClient(TestServer(build_metrics_app(registry))) as client:
+        response = await client.get("/metrics")
+        return response.status, await response.text()
+
+
+def test_metrics_endpoint(tmp_path):
+    status, body = asyncio.run(_scenario(f"sqlite+aiosqlite:///{tmp_path / 'metrics.db'}"))
+    assert status == 200
+    assert 'db_statement_seconds_count{operation="SELECT"}' in body
+    assert 'db_statement_seconds_count{operation="PRAGMA"}' in body
+    assert 'bot_handler_seconds_count{handler="test_metrics.echo"} 1' in body
+
+
+def test_metrics_server_reports_a_busy_port():
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        port = taken.getsockname()[1]
+        with pytest.raises(OSError):
+            asyncio.run(start_metrics_server("127.0.0.1", port))
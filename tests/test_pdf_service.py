@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+from pdf.service import PdfRenderError, PdfRenderService
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def test_stale_failure_does_not_recycle_the_new_pool():
+    service = PdfRenderService(workers=1, timeout=1, max_tasks_per_worker=0)
+    failed = service._get_pool()
+    service._recycle(failed)
+    fresh = service._get_pool()
+    assert fresh is not failed
+
+    service._recycle(failed)  # a second render on the old pool fails late
+    assert service._pool is fresh
+    service.shutdown()
+
+
+async def _timeout_scenario():
+    service = PdfRenderService(workers=2, timeout=10, max_tasks_per_worker=0)
+    # start both workers before timing anything
+    await asyncio.gather(*(service._run("variant", "warm-up", 30, _sleep, 0.2) for _ in range(2)))
+    old = service._pool
+    old_processes = list(old._processes.values())
+    try:
+        hung, healthy = await asyncio.gather(
+            service._run("variant", "hung", 0.5, _sleep, 30),
+            service._run("variant", "healthy", 10, _sleep, 1.5),
+            return_exceptions=True,
+        )
+        after = await service._run("variant", "next", 10, _sleep, 0)
+        await asyncio.gather(*service._retiring)
+        old_alive = [process.is_alive() for process in old_processes]
+        return hung, healthy, after, service._pool is not old, old_alive
+    finally:
+        service.shutdown()
+
+
+def test_timeout_spares_other_renders_on_the_pool():
+    hung, healthy, after, replaced, old_alive = asyncio.run(_timeout_scenario())
+    assert isinstance(hung, PdfRenderError)
+    assert healthy == 1.5  # finished on the retired pool instead of being killed with it
+    assert after == 0
+    assert replaced
+    assert old_alive == [False, False]
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from bot.queue import AlreadyQueued, QueueFull, VariantQueue
+
+
+async def _scenario():
+    queue = VariantQueue(max_concurrency=2, max_waiting=2, progress_interval=0.01)
+    release = asyncio.Event()
+    positions: dict[int, list[int]] = {}
+    peak = 0
+
+    async def job(user_id):
+        nonlocal peak
+        peak = max(peak, queue.running)
+        await release.wait()
+        return user_id
+
+    def submit(user_id):
+        async def notify(position):
+            positions.setdefault(user_id, []).append(position)
+
+        return asyncio.create_task(queue.run(user_id, lambda: job(user_id), notify=notify))
+
+    tasks = [submit(user_id) for user_id in (1, 2, 3, 4)]
+    await asyncio.sleep(0.05)
+    with pytest.raises(AlreadyQueued):
+        await queue.run(3, lambda: job(3))
+    with pytest.raises(QueueFull):
+        await queue.run(5, lambda: job(5))
+    waiting = queue.waiting
+    release.set()
+    results = await asyncio.gather(*tasks)
+    return results, waiting, peak, positions
+
+
+def test_queue_caps_concurrency_and_reports_positions():
+    results, waiting, peak, positions = asyncio.run(_scenario())
+    assert results == [1, 2, 3, 4]
+    assert waiting == 2
+    assert peak == 2
+    # running jobs are never notified; waiting ones see their place, then 0 on start
+    assert 1 not in positions and 2 not in positions
+    assert positions[3] == [1, 0]
+    assert positions[4] == [2, 0]
@@ -0,0 +1,36 @@
+import os
+
+from pdf.retention import PdfRetentionManager
+
+
+def _write(directory, task_set_id, size, mtime):
+    path = directory / f"taskset_{task_set_id}.pdf"
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_sweep_removes_expired_files(tmp_path):
+    manager = PdfRetentionManager(tmp_path, max_bytes=0, max_age=100, interval=1)
+    old = _write(tmp_path, 1, 10, mtime=1000)
+    fresh = _write(tmp_path, 2, 10, mtime=1950)
+    assert manager.sweep(now=2000) == [old]
+    assert fresh.exists()
+
+
+def test_sweep_evicts_least_recently_used_over_size_limit(tmp_path):
+    manager = PdfRetentionManager(tmp_path, max_bytes=25, max_age=0, interval=1)
+    first = _write(tmp_path, 1, 10, mtime=1000)
+    second = _write(tmp_path, 2, 10, mtime=1001)
+    third = _write(tmp_path, 3, 10, mtime=1002)
+    os.utime(first, (1003, 1003))  # served recently
+    assert manager.sweep(now=2000) == [second]
+    assert first.exists() and third.exists()
+
+
+def test_load_returns_none_for_evicted_file(tmp_path):
+    manager = PdfRetentionManager(tmp_path, max_bytes=0, max_age=0, interval=1)
+    _write(tmp_path, 1, 3, mtime=1000)
+    assert manager.load(1) == b"xxx"
+    assert os.path.getmtime(tmp_path / "taskset_1.pdf") > 1000
+    assert manager.load(2) is None
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+from bot.handlers.report import parse_report_args
+from db.models import AnswerAttempt, Subject
+from db.repository import create_task_set, create_user
+from db.rollups import grade_report, refresh_rollups
+
+
+async def _scenario(sessions):
+    tasks = [{"topic": "linear", "text": "x = 1", "answer": "1"}, {"topic": "proportion", "text": "?", "answer": "2"}]
+    async with sessions() as session:
+        attempts = []
+        for tg_id, grade in ((101, "9А"), (102, "9А"), (103, "9Б")):
+            user = await create_user(session, tg_id=tg_id, full_name="Ученик", grade=grade)
+            _, created = await create_task_set(session, user_id=user.id, subject=Subject.algebra, tasks=tasks)
+            for day, correct in ((1, False), (2, True)):
+                for task in created:
+                    attempts.append(
+                        AnswerAttempt(
+                            task_id=task.id,
+                            user_id=user.id,
+                            user_answer="1",
+                            is_correct=correct,
+                            looked_answer=False,
+                            created_at=datetime(2026, 3, day, 12),
+                        )
+                    )
+        session.add_all(attempts)
+        await session.commit()
+
+        first = await refresh_rollups(session, today=date(2026, 3, 2))
+        again = await refresh_rollups(session, today=date(2026, 3, 3))
+        by_topic = await grade_report(session, since=date(2026, 3, 1), grade="9А")
+        by_grade = await grade_report(session, since=date(2026, 3, 2))
+    return first, again, by_topic, by_grade
+
+
+def test_rollups_aggregate_by_grade_and_topic(database):
+    first, again, by_topic, by_grade = asyncio.run(_scenario(database.sessions))
+    assert first == [date(2026, 3, 1), date(2026, 3, 2)]
+    # the next run starts from the last rolled-up day
+    assert again == [date(2026, 3, 2), date(2026, 3, 3)]
+    assert [(row.topic, row.total, row.correct) for row in by_topic] == [("linear", 4, 2), ("proportion", 4, 2)]
+    assert [(row.grade, row.subject, row.total, row.correct) for row in by_grade] == [
+        ("9А", Subject.algebra, 4, 4),
+        ("9Б", Subject.algebra, 2, 2),
+    ]
+
+
+def test_report_args_are_positional():
+    assert parse_report_args(None) == (None, 30)
+    assert parse_report_args("9") == ("9", 30)  # a numeric grade, not days
+    assert parse_report_args("11 14") == ("11", 14)
+    assert parse_report_args("9Б") == ("9Б", 30)
+    assert parse_report_args("days=7") == (None, 7)
+    assert parse_report_args("days=7 grade=11") == ("11", 7)
+    assert parse_report_args("9Б 366") == ("9Б", 366)
+    # a far too long period would overflow the date arithmetic in the handler
+    for bad in ("9Б неделя", "1 2 3", "days=x", "week=2", "9 grade=10", "9Б 367", "9Б 99999999999", "days=1000000"):
+        with pytest.raises(ValueError):
+            parse_report_args(bad)
@@ -0,0 +1,35 @@
+import asyncio
+
+from db.models import Subject
+from db.repository import calc_stats, create_task_set, create_user, save_attempt
+from db.stats import rebuild_stats
+
+
+async def _scenario(sessions):
+    tasks = [
+        {"topic": "linear", "text": "x + 1 = 2", "answer": "1"},
+        {"topic": "linear", "text": "x + 2 = 4", "answer": "2"},
+        {"topic": "probability", "text": "?", "answer": "0.5"},
+    ]
+    async with sessions() as session:
+        user = await create_user(session, tg_id=1, full_name="Иванов Иван", grade="9Б")
+        _, created = await create_task_set(session, user_id=user.id, subject=Subject.algebra, tasks=tasks)
+        await save_attempt(session, task=created[0], user=user, user_answer="3", is_correct=False)
+        await save_attempt(session, task=created[0], user=user, user_answer="1", is_correct=True)
+        await save_attempt(session, task=created[1], user=user, user_answer="2", is_correct=True)
+        await save_attempt(session, task=created[2], user=user, user_answer="-", is_correct=False, looked_answer=True)
+        incremental = await calc_stats(session, user.id)
+        await rebuild_stats(session)
+        rebuilt = await calc_stats(session, user.id)
+    return incremental, rebuilt
+
+
+def test_counters_match_rebuild(database):
+    incremental, rebuilt = asyncio.run(_scenario(database.sessions))
+    assert incremental["total_attempts"] == 4
+    assert incremental["total_correct"] == 2
+    assert incremental["peeked"] == 1
+    assert incremental["by_subject"] == {"algebra": {"total": 4, "correct": 2}}
+    assert incremental["by_topic"]["linear"] == {"total": 3, "correct": 2}
+    assert incremental["last_7d"] == {"total": 4, "correct": 2}
+    assert rebuilt == incremental
@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import func, select
+
+from bot import storage
+from bot.states import CheckingAnswers
+from bot.storage import SQLAlchemyStorage
+from db.models import FsmRecord
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+
+class _TwoHoursLater(datetime):
+    @classmethod
+    def utcnow(cls):
+        return datetime.utcnow() + timedelta(hours=2)
+
+
+async def _scenario(sessions, monkeypatch):
+    first = SQLAlchemyStorage(sessions, cache_size=10, cache_ttl=60, state_ttl=3600)
+    await first.set_state(KEY, CheckingAnswers.current_order)
+    await first.update_data(KEY, {"task_set_id": 7, "current_order": 2})
+
+    # a restarted or second process sees the same state
+    second = SQLAlchemyStorage(sessions, cache_size=10, cache_ttl=0, state_ttl=3600)
+    restored = (await second.get_state(KEY), await second.get_data(KEY))
+
+    monkeypatch.setattr(storage, "datetime", _TwoHoursLater)  # past state_ttl
+    expired = await second.get_state(KEY)
+    cached = await first.get_state(KEY)
+    purged = await second.purge()
+
+    await first.set_state(KEY, "Registration:full_name")
+    await first.set_state(KEY, None)
+    await first.set_data(KEY, {})
+    async with sessions() as session:
+        rows_after_clear = (await session.execute(select(func.count()).select_from(FsmRecord))).scalar()
+    return restored, expired, cached, purged, rows_after_clear
+
+
+def test_states_persist_expire_and_clear(database, monkeypatch):
+    restored, expired, cached, purged, rows_after_clear = asyncio.run(_scenario(database.sessions, monkeypatch))
+    assert restored == ("CheckingAnswers:current_order", {"task_set_id": 7, "current_order": 2})
+    assert expired is None
+    assert cached is None  # a warm cache entry expires with its state
+    assert purged == 1
+    assert rows_after_clear == 0
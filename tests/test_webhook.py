@@ -0,0 +1,94 @@
+import asyncio
+import dataclasses
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.webhook import build_webhook_app
+from core.config import load_settings
+
+SECRET = "test-secret"
+
+
+def _update(update_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Ученик"},
+            "text": text,
+        },
+    }
+
+
+async def _scenario():
+    seen = []
+    running = 0
+    peak = 0
+    router = Router()
+
+    @router.message()
+    async def record(message: Message) -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        seen.append(message.text)
+        running -= 1
+
+    dispatcher = Dispatcher()
+    dispatcher.include_router(router)
+    settings = dataclasses.replace(load_settings(), webhook_secret=SECRET, webhook_max_concurrency=2)
+    app = build_webhook_app(dispatcher, Bot("123:abc"), settings)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+
+    denied = await client.post(settings.webhook_path, json=_update(1, "чужой"))
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    accepted = [
+        (await client.post(settings.webhook_path, json=_update(n, f"ответ {n}"), headers=headers)).status
+        for n in range(2, 7)
+    ]
+    # closing drains the updates still being processed
+    await client.close()
+    return denied.status, accepted, sorted(seen), peak
+
+
+def test_webhook_verifies_secret_limits_concurrency_and_drains():
+    denied, accepted, seen, peak = asyncio.run(_scenario())
+    assert denied == 401
+    assert accepted == [200] * 5
+    assert seen == [f"ответ {n}" for n in range(2, 7)]
+    assert peak == 2
+
+
+async def _full_queue_scenario():
+    release = asyncio.Event()
+    router = Router()
+
+    @router.message()
+    async def wait(message: Message) -> None:
+        await release.wait()
+
+    dispatcher = Dispatcher()
+    dispatcher.include_router(router)
+    settings = dataclasses.replace(load_settings(), webhook_secret=SECRET, webhook_max_pending=2)
+    app = build_webhook_app(dispatcher, Bot("123:abc"), settings)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    statuses = [
+        (await client.post(settings.webhook_path, json=_update(n, "ответ"), headers=headers)).status
+        for n in range(1, 4)
+    ]
+    release.set()
+    await client.close()
+    return statuses
+
+
+def test_webhook_rejects_updates_over_max_pending():
+    assert asyncio.run(_full_queue_scenario()) == [200, 200, 503]
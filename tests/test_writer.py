@@ -0,0 +1,123 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from sqlalchemy import func, select
+
+from db import writer
+from db.models import AnswerAttempt, Subject
+from db.repository import calc_stats, create_task_set, create_user, save_attempts
+
+
+def _use_sessions(monkeypatch, sessions):
+    @asynccontextmanager
+    async def get_session():
+        async with sessions() as session:
+            yield session
+
+    monkeypatch.setattr(writer, "get_session", get_session)
+
+
+async def _scenario(sessions):
+    async with sessions() as session:
+        user = await create_user(session, tg_id=201, full_name="Ученик", grade="9А")
+        other = await create_user(session, tg_id=202, full_name="Ученик", grade="9А")
+        _, tasks = await create_task_set(
+            session, user_id=user.id, subject=Subject.algebra, tasks=[{"topic": "linear", "text": "x", "answer": "1"}]
+        )
+
+    attempt_writer = writer.AttemptWriter(flush_interval=60, batch_size=100)
+    attempt_writer.submit(tasks[0], other.id, "2", False)
+    await attempt_writer.sync(user.id)  # nothing queued for this user: no flush
+    assert len(attempt_writer) == 1
+
+    for answer in ("2", "3", "1"):
+        attempt_writer.submit(tasks[0], user.id, answer, answer == "1")
+    await attempt_writer.sync(user.id)
+    assert len(attempt_writer) == 0
+    async with sessions() as session:
+        stats = await calc_stats(session, user.id)
+
+    attempt_writer.submit(tasks[0], user.id, "1", True, looked_answer=True)
+    await attempt_writer.close()
+    async with sessions() as session:
+        stored = (await session.execute(select(func.count(AnswerAttempt.id)))).scalar()
+    return stats, stored
+
+
+def test_writer_flushes_for_readers_and_on_close(database, monkeypatch):
+    _use_sessions(monkeypatch, database.sessions)
+    stats, stored = asyncio.run(_scenario(database.sessions))
+    assert stats["total_attempts"] == 3
+    assert stats["total_correct"] == 1
+    assert stored == 5
+
+
+async def _failing_flush_scenario(sessions, monkeypatch):
+    failures = [ValueError("bad row")]
+
+    async def flaky_save_attempts(session, attempts):
+        if failures:
+            raise failures.pop()
+        await save_attempts(session, attempts)
+
+    monkeypatch.setattr(writer, "save_attempts", flaky_save_attempts)
+    async with sessions() as session:
+        user = await create_user(session, tg_id=203, full_name="Ученик", grade="9А")
+        _, tasks = await create_task_set(
+            session, user_id=user.id, subject=Subject.algebra, tasks=[{"topic": "linear", "text": "x", "answer": "1"}]
+        )
+
+    attempt_writer = writer.AttemptWriter(flush_interval=0.01, batch_size=100)
+    attempt_writer.start()
+    attempt_writer.submit(tasks[0], user.id, "2", False)
+    await asyncio.sleep(0.1)  # the first flush fails, the loop must survive it
+    attempt_writer.submit(tasks[0], user.id, "1", True)
+    await asyncio.sleep(0.1)
+    pending = len(attempt_writer)
+    running = not attempt_writer._task.done()
+    await attempt_writer.close()
+    async with sessions() as session:
+        stored = (await session.execute(select(func.count(AnswerAttempt.id)))).scalar()
+    return running, pending, stored
+
+
+def test_writer_survives_a_failed_flush(database, monkeypatch):
+    _use_sessions(monkeypatch, database.sessions)
+    running, pending, stored = asyncio.run(_failing_flush_scenario(database.sessions, monkeypatch))
+    assert running
+    assert pending == 0
+    assert stored == 2
+
+
+async def _bad_row_scenario(sessions, monkeypatch):
+    async def picky_save_attempts(session, attempts):
+        if any(attempt.user_answer == "bad" for attempt in attempts):
+            raise ValueError("bad row")
+        await save_attempts(session, attempts)
+
+    monkeypatch.setattr(writer, "save_attempts", picky_save_attempts)
+    async with sessions() as session:
+        user = await create_user(session, tg_id=204, full_name="Ученик", grade="9А")
+        _, tasks = await create_task_set(
+            session, user_id=user.id, subject=Subject.algebra, tasks=[{"topic": "linear", "text": "x", "answer": "1"}]
+        )
+
+    attempt_writer = writer.AttemptWriter(flush_interval=0.01, batch_size=100, max_pending=3, max_retries=2)
+    attempt_writer.start()
+    accepted = [attempt_writer.submit(tasks[0], user.id, answer, False) for answer in ("2", "bad", "3", "4")]
+    await asyncio.sleep(0.2)  # two failed batches, then the rows are written one by one
+    pending = len(attempt_writer)
+    running = not attempt_writer._task.done()
+    await attempt_writer.close()
+    async with sessions() as session:
+        stored = (await session.execute(select(AnswerAttempt.user_answer).order_by(AnswerAttempt.id))).scalars().all()
+    return accepted, running, pending, stored
+
+
+def test_writer_drops_a_row_that_always_fails(database, monkeypatch):
+    _use_sessions(monkeypatch, database.sessions)
+    accepted, running, pending, stored = asyncio.run(_bad_row_scenario(database.sessions, monkeypatch))
+    assert accepted == [True, True, True, False]  # the queue is full: the caller writes the 4th itself
+    assert running
+    assert pending == 0
+    assert stored == ["2", "3"]
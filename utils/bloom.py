@@ -0,0 +1,37 @@
+from typing import Optional
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit fingerprints, stored as raw bytes.
+
+    The ``hashes`` bit positions of a fingerprint come from its two 32-bit
+    halves (double hashing), so fingerprints must already be well mixed
+    (e.g. a ``hashlib.blake2b`` digest).
+    """
+
+    def __init__(self, size_bits: int, hashes: int = 4, data: Optional[bytes] = None) -> None:
+        self.size_bits = size_bits
+        self.hashes = hashes
+        nbytes = (size_bits + 7) // 8
+        # a filter of another size (the setting was changed) cannot be reused
+        self._bits = bytearray(data) if data is not None and len(data) == nbytes else bytearray(nbytes)
+
+    def _positions(self, fingerprint: int) -> list[int]:
+        low, high = fingerprint & 0xFFFFFFFF, (fingerprint >> 32) | 1
+        return [(low + i * high) % self.size_bits for i in range(self.hashes)]
+
+    def add(self, fingerprint: int) -> None:
+        for position in self._positions(fingerprint):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, fingerprint: int) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(fingerprint))
+
+    def fill_ratio(self) -> float:
+        return int.from_bytes(self._bits, "little").bit_count() / self.size_bits
+
+    def clear(self) -> None:
+        self._bits = bytearray(len(self._bits))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._bits)